@@ -1,26 +1,146 @@
 import json
 import os
+from collections import namedtuple
 from datetime import datetime
 from config import LOG_DIR
+from activity_records import append_records
+from log_archive import read_archived
 
-LOG_FILE = os.path.join(LOG_DIR, "activity.json")
 
-def log_activity(state, idle_sec):
+# --------------------------------------------------
+# One tick of activity (immutable copy of DailyState)
+# --------------------------------------------------
+# Field names mirror DailyState so either can be logged.
+# input_counts: ActivityTracker.InputCounts for the tick (or None)
+ActivitySample = namedtuple("ActivitySample", [
+    "timestamp",
+    "normal_seconds",
+    "ot_seconds",
+    "idle_seconds",
+    "lunch_used",
+    "breaks_used",
+    "input_counts"
+], defaults=(None,))
+
+
+def take_sample(state, idle_sec, now=None, input_counts=None):
+    return ActivitySample(
+        now or datetime.now(),
+        state.normal_seconds,
+        state.ot_seconds,
+        idle_sec,
+        state.lunch_used,
+        state.breaks_used,
+        input_counts
+    )
+
+
+# --------------------------------------------------
+# Per-day append-only journal (one JSON line per tick)
+# --------------------------------------------------
+# Files we already checked for a torn last line (crash mid-write)
+_tail_checked = set()
+
+
+def log_path(work_date):
+    """
+    work_date : YYYY-MM-DD
+    """
+    return os.path.join(LOG_DIR, f"{work_date}.jsonl")
+
+
+def _ensure_clean_tail(path):
+    # A crash mid-write can leave a partial last line without "\n".
+    # Terminate it once so the next entry starts on its own line.
+    if path in _tail_checked:
+        return
+
+    _tail_checked.add(path)
+
+    try:
+        with open(path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    except FileNotFoundError:
+        pass
+
+
+def _entry(sample):
     entry = {
-        "timestamp": datetime.now().isoformat(),
-        "normal_hours": round(state.normal_seconds / 3600, 2),
-        "ot_hours": round(state.ot_seconds / 3600, 2),
-        "idle_seconds": int(idle_sec),
-        "lunch_used": state.lunch_used,
-        "breaks_used": state.breaks_used
+        "timestamp": sample.timestamp.isoformat(),
+        "normal_hours": round(sample.normal_seconds / 3600, 2),
+        "ot_hours": round(sample.ot_seconds / 3600, 2),
+        "idle_seconds": int(sample.idle_seconds),
+        "lunch_used": sample.lunch_used,
+        "breaks_used": sample.breaks_used
     }
+    # Activity intensity: input events during this tick
+    if sample.input_counts is not None:
+        entry.update(sample.input_counts._asdict())
+    return entry
+
+
+def write_samples(samples, fsync=False):
+    """
+    Append a batch of ActivitySample to the per-day journals
+    (JSON lines + binary records). One open per file per batch.
+    """
+    by_date = {}
+    for sample in samples:
+        by_date.setdefault(sample.timestamp.strftime("%Y-%m-%d"), []).append(sample)
+
+    for work_date, day_samples in by_date.items():
+        path = log_path(work_date)
+        _ensure_clean_tail(path)
+
+        # Constant cost per tick: lines appended, history never rewritten
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(
+                json.dumps(_entry(s), separators=(",", ":")) + "\n"
+                for s in day_samples
+            ))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        # Fixed-width twin of the same ticks (dashboard analytics read this)
+        append_records(work_date, day_samples, fsync=fsync)
+
+
+def log_activity(state, idle_sec, input_counts=None):
+    write_samples([take_sample(state, idle_sec, input_counts=input_counts)])
+
 
-    data = []
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+def read_activity_log(work_date):
+    """
+    Returns all entries for work_date.
+    Unparseable lines (e.g. truncated last line) are skipped.
+    """
+    entries = []
 
-    data.append(entry)
+    try:
+        with open(log_path(work_date), "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        # Older days live in the monthly archive
+        data = read_archived(f"{work_date}.jsonl")
+        if data is None:
+            return []
+        for line in data.decode("utf-8").splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
 
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    return entries
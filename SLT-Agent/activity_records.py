@@ -0,0 +1,100 @@
+import os
+import struct
+from config import LOG_DIR
+from log_archive import read_archived
+
+
+# ==================================================
+# COMPACT BINARY ACTIVITY RECORDS (YYYY-MM-DD.bin)
+# ==================================================
+# One fixed-width record per tick, little-endian, 5 × uint32 = 20 bytes:
+#
+#   epoch_sec | normal_sec | ot_sec | idle_sec | flags
+#
+# flags: bit 0     = lunch_used
+#        bits 1..8 = breaks_used
+#
+# ⚠️ workforce-dashboard/backend/main.py reads this layout via mmap,
+#    keep both in sync.
+RECORD = struct.Struct("<5I")
+RECORD_SIZE = RECORD.size
+FIELDS = ("epoch", "normal_seconds", "ot_seconds", "idle_seconds", "flags")
+
+LUNCH_FLAG = 0x1
+BREAKS_SHIFT = 1
+
+# Files already trimmed to a whole number of records
+_tail_checked = set()
+
+
+def record_path(work_date):
+    """
+    work_date : YYYY-MM-DD
+    """
+    return os.path.join(LOG_DIR, f"{work_date}.bin")
+
+
+def pack_flags(lunch_used, breaks_used):
+    return (LUNCH_FLAG if lunch_used else 0) | (int(breaks_used) << BREAKS_SHIFT)
+
+
+def unpack_flags(flags):
+    return bool(flags & LUNCH_FLAG), flags >> BREAKS_SHIFT
+
+
+def _trim_partial_record(path):
+    # A crash mid-write can leave a partial record at the end.
+    # Drop it once so every following record stays aligned.
+    if path in _tail_checked:
+        return
+
+    _tail_checked.add(path)
+
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return
+
+    extra = size % RECORD_SIZE
+    if extra:
+        with open(path, "rb+") as f:
+            f.truncate(size - extra)
+
+
+def pack_record(sample):
+    """
+    sample : ActivitySample (or anything with the same attributes)
+    """
+    return RECORD.pack(
+        int(sample.timestamp.timestamp()),
+        int(sample.normal_seconds),
+        int(sample.ot_seconds),
+        max(0, int(sample.idle_seconds)),
+        pack_flags(sample.lunch_used, sample.breaks_used)
+    )
+
+
+def append_records(work_date, samples, fsync=False):
+    path = record_path(work_date)
+    _trim_partial_record(path)
+
+    with open(path, "ab") as f:
+        f.write(b"".join(pack_record(s) for s in samples))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def read_records(work_date):
+    """
+    Returns list of (epoch, normal_sec, ot_sec, idle_sec, flags) tuples.
+    A trailing partial record is ignored.
+    """
+    try:
+        with open(record_path(work_date), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        data = read_archived(f"{work_date}.bin") or b""
+
+    usable = len(data) - (len(data) % RECORD_SIZE)
+    return list(RECORD.iter_unpack(data[:usable]))
@@ -1,38 +1,106 @@
-from datetime import datetime
-from threading import Lock
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
 from pynput import keyboard, mouse
 
+from foreground_app import get_backend
+
+
+# Input events since the previous take_counts() (activity intensity)
+InputCounts = namedtuple("InputCounts", ["keys", "clicks", "scrolls", "moves"])
+
 
 class ActivityTracker:
-    def __init__(self):
-        # Last time any keyboard/mouse input was detected
-        self.last_input_time = datetime.now()
-        self._lock = Lock()
+    """
+    Input hooks run on pynput threads, hundreds of times per second
+    while the mouse moves, so they do the minimum:
+    - one monotonic timestamp store (plain attribute write, no lock)
+    - one counter increment
+
+    Each counter only ever grows and is written by a single listener
+    thread; the agent reads totals and diffs them (take_counts), so no
+    lock is needed on either side.
+
+    The foreground window is polled by the agent (foreground_window),
+    through a platform backend (foreground_app) chosen on first use.
+    """
+
+    def __init__(self, foreground=None):
+        # time.monotonic() of the last keyboard/mouse input
+        self._last_input = time.monotonic()
+
+        # Running totals (keyboard thread: keys; mouse thread: the rest)
+        self._keys = 0
+        self._clicks = 0
+        self._scrolls = 0
+        self._moves = 0
+        self._sampled = InputCounts(0, 0, 0, 0)
+
+        # foreground_app backend (anything with sample())
+        self._foreground = foreground
+        self._foreground_failed = False
 
         self._keyboard_listener = None
         self._mouse_listener = None
         self._started = False
 
     # --------------------------------------------
-    # Keyboard input handler
+    # Input handlers (pynput threads – keep tiny)
     # --------------------------------------------
-    def _on_keyboard(self, key):
-        with self._lock:
-            self.last_input_time = datetime.now()
+    def _on_key(self, key):
+        self._keys += 1
+        self._last_input = time.monotonic()
+
+    def _on_click(self, x, y, button, pressed):
+        if pressed:
+            self._clicks += 1
+        self._last_input = time.monotonic()
+
+    def _on_scroll(self, x, y, dx, dy):
+        self._scrolls += 1
+        self._last_input = time.monotonic()
+
+    def _on_move(self, x, y):
+        self._moves += 1
+        self._last_input = time.monotonic()
 
     # --------------------------------------------
-    # Mouse input handler
+    # Readers (agent thread)
     # --------------------------------------------
-    def _on_mouse(self, *args):
-        with self._lock:
-            self.last_input_time = datetime.now()
+    def idle_seconds(self):
+        """Seconds since the last input (monotonic: immune to clock changes)."""
+        return max(0.0, time.monotonic() - self._last_input)
+
+    @property
+    def last_input_time(self):
+        """Wall-clock time of the last input (derived)."""
+        return datetime.now() - timedelta(seconds=self.idle_seconds())
+
+    def take_counts(self):
+        """Input events since the previous call."""
+        totals = InputCounts(self._keys, self._clicks, self._scrolls, self._moves)
+        counts = InputCounts(*(now - before for now, before in zip(totals, self._sampled)))
+        self._sampled = totals
+        return counts
+
+    def foreground_window(self):
+        """ForegroundWindow(process, title) now, or None."""
+        if self._foreground is None:
+            self._foreground = get_backend()
+        try:
+            return self._foreground.sample()
+        except Exception as e:
+            # Reported once; a window closing mid-sample is routine
+            if not self._foreground_failed:
+                self._foreground_failed = True
+                print("⚠️ Foreground window sample failed:", e)
+            return None
 
     # --------------------------------------------
     # Reset input time (day change / restart safe)
     # --------------------------------------------
     def reset(self):
-        with self._lock:
-            self.last_input_time = datetime.now()
+        self._last_input = time.monotonic()
 
     # --------------------------------------------
     # Start listeners (SAFE: only once)
@@ -43,16 +111,16 @@ class ActivityTracker:
 
         # Keyboard listener
         self._keyboard_listener = keyboard.Listener(
-            on_press=self._on_keyboard
+            on_press=self._on_key
         )
         self._keyboard_listener.daemon = True
         self._keyboard_listener.start()
 
         # Mouse listener
         self._mouse_listener = mouse.Listener(
-            on_move=self._on_mouse,
-            on_click=self._on_mouse,
-            on_scroll=self._on_mouse
+            on_move=self._on_move,
+            on_click=self._on_click,
+            on_scroll=self._on_scroll
         )
         self._mouse_listener.daemon = True
         self._mouse_listener.start()
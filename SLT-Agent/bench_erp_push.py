@@ -0,0 +1,121 @@
+"""
+ERP push-pipeline benchmark (offline, against erp_stub_server).
+
+Seeds daily_work with N closed days in a throw-away storage dir and
+measures run_erp_push wall time, request count and bytes sent for:
+- initial : every day is new
+- steady  : nothing changed since the last push
+- changed : --changed-pct of the days edited
+
+    python bench_erp_push.py --days 90 --workers 4 --latency 0.03
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from erp_stub_server import StubErp, STUB_EMPLOYEE, start_in_background
+
+
+def seed_days(save_days, days, rng):
+    rows = []
+    for i in range(days, 0, -1):
+        day = date.today() - timedelta(days=i)
+        start_min = rng.randint(8 * 60, 11 * 60)
+        worked = rng.randint(4 * 3600, 11 * 3600)
+        normal = min(worked, 8 * 3600)
+        first = f"{day} {start_min // 60:02d}:{start_min % 60:02d}:00"
+        end_min = start_min + worked // 60 + 60
+        last = f"{day} {min(end_min // 60, 23):02d}:{end_min % 60:02d}:00"
+        rows.append((str(day), normal, worked - normal, first, last))
+    save_days(rows)
+    return rows
+
+
+def run_phase(name, erp, push, workers, verbose):
+    erp.reset_stats()
+    out = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if verbose else out):
+        result = push(workers=workers)
+    server = erp.stats()
+    return {
+        "phase": name,
+        "days": result["days"],
+        "failed": result["failed"],
+        "seconds": result["seconds"],
+        "requests": server["requests"],
+        "bytes_sent": server["bytes_in"],
+        "bytes_received": server["bytes_out"],
+        "by_status": server["by_status"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SLT Agent ERP push path")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub 503 fraction")
+    parser.add_argument("--rate-limit", type=float, default=None, help="stub requests/second")
+    parser.add_argument("--client-rate", type=float, default=0, help="client token bucket (0 = off)")
+    parser.add_argument("--changed-pct", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show push output")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    server, erp, url = start_in_background(
+        StubErp(args.latency, args.error_rate, args.rate_limit, seed=args.seed)
+    )
+
+    # Agent modules read config at import → isolate storage + ERP first
+    os.environ["LOCALAPPDATA"] = tempfile.mkdtemp(prefix="slt-bench-")
+    os.environ["ERP_BASE_URL_ENV"] = url
+
+    import erp_client
+    import local_db
+    import step4_erp_push
+    from config import STORAGE_PATH
+
+    erp_client._client = erp_client.ErpClient(
+        base_url=url,
+        rate_limiter=erp_client.TokenBucket(args.client_rate, max(1, args.client_rate)) if args.client_rate else None,
+        breaker=erp_client.CircuitBreaker()
+    )
+
+    with open(STORAGE_PATH, "w", encoding="utf-8") as f:
+        json.dump({"employee_id": STUB_EMPLOYEE["name"]}, f)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        local_db.init_db()
+    rows = seed_days(local_db.save_days, args.days, rng)
+
+    results = [run_phase("initial", erp, step4_erp_push.run_erp_push, args.workers, args.verbose)]
+    results.append(run_phase("steady", erp, step4_erp_push.run_erp_push, args.workers, args.verbose))
+
+    changed = rng.sample(rows, max(1, int(len(rows) * args.changed_pct / 100)))
+    local_db.save_days([(d, n + 600, ot, first, last) for d, n, ot, first, last in changed])
+    results.append(run_phase("changed", erp, step4_erp_push.run_erp_push, args.workers, args.verbose))
+
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\n📈 ERP push benchmark – {args.days} days, {args.workers} worker(s), "
+          f"latency {args.latency * 1000:.0f} ms, error rate {args.error_rate:.0%}")
+    print(f"{'phase':<9} {'days':>5} {'failed':>6} {'seconds':>8} {'requests':>9} {'sent B':>9} {'recv B':>9}")
+    for r in results:
+        print(f"{r['phase']:<9} {r['days']:>5} {r['failed']:>6} {r['seconds']:>8.3f} "
+              f"{r['requests']:>9} {r['bytes_sent']:>9} {r['bytes_received']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,9 @@ APP_NAME = "SLT-Agent"
 # ==================================================
 # ERP DETAILS
 # ==================================================
-ERP_BASE_URL = "https://erp.sltechsoft.com"
-ERP_LOGIN_URL = "https://erp.sltechsoft.com/login"
+# Override (e.g. local stand-in: erp_stub_server.py) via ERP_BASE_URL_ENV
+ERP_BASE_URL = os.getenv("ERP_BASE_URL_ENV", "https://erp.sltechsoft.com").rstrip("/")
+ERP_LOGIN_URL = f"{ERP_BASE_URL}/login"
 
 # 🔐 AGENT API USER (Background sync only)
 # ⚠️ Production me env variable use karna recommended
@@ -69,12 +70,52 @@ LUNCH_DURATION_MIN = 60        # auto-detect (once/day)
 BREAK_DURATION_MIN = 15        # auto-detect
 MAX_BREAKS_PER_DAY = 2
 
+# Agent loop (tick_scheduler.TickScheduler – monotonic deadlines,
+# each tick credits the time that really elapsed)
+AGENT_TICK_SEC = 60            # sub-minute allowed (more log lines per minute)
+SUSPEND_GAP_SEC = 120          # sleep overran by this much → machine slept, gap not counted
+
+# ==================================================
+# 🪟 APP USAGE (FOREGROUND WINDOW)
+# ==================================================
+# Sampled once per credited tick (foreground_app backends), stored as
+# (minute, app) runs + per-day title totals in local.db – no screenshots
+APP_TRACKING_BACKEND = "auto"  # "auto" / "windows" / "x11" / "none" (off)
+APP_TRACK_TITLES = True        # False → process names only
+APP_TITLE_MAX_LEN = 120
+APP_TITLES_PER_DAY = 20        # distinct titles kept per app and day, rest → "(other)"
+
 # ==================================================
 # 📸 SCREENSHOT POLICY
 # ==================================================
 SCREENSHOT_INTERVAL_MIN = 10   # every 10 min
 SCREENSHOT_DURING_OVERTIME = True
 
+# Capture + encode run on a worker thread (step5_screenshot.ScreenshotWorker)
+SCREENSHOT_FORMAT = "webp"     # "webp" / "jpeg" / "png" (webp → jpeg if unsupported)
+SCREENSHOT_QUALITY = 60        # webp / jpeg quality (1-95)
+SCREENSHOT_MAX_WIDTH = 1920    # downscale wider captures (0 = full resolution)
+SCREENSHOT_QUEUE_MAX = 4       # pending captures; more are dropped
+
+# Static screen → near-identical frames are stored as a reference only
+SCREENSHOT_DEDUP = True
+SCREENSHOT_DEDUP_MAX_DISTANCE = 4   # dHash bits (of 64) that may differ
+SCREENSHOT_MANIFEST_FILE = "manifest.jsonl"   # per-day capture log (screenshot_store.py)
+
+# ERP upload queue (screenshot_uploads in local.db) – runs after each
+# ERP push cycle, on its own small request budget
+SCREENSHOT_UPLOAD_DOCTYPE = "Employee"   # attached to the employee record
+SCREENSHOT_UPLOAD_WORKERS = 2
+SCREENSHOT_UPLOAD_RATE_PER_SEC = 1
+SCREENSHOT_UPLOAD_BATCH = 30             # files per cycle
+SCREENSHOT_UPLOAD_MAX_ATTEMPTS = 10
+
+# Local storage quota (screenshot_quota.ScreenshotQuota) – uploaded
+# screenshots are deleted first, oldest first
+SCREENSHOT_QUOTA_MB = 2048
+SCREENSHOT_MAX_AGE_DAYS = 30
+SCREENSHOT_EVICT_BATCH = 20    # files deleted per step (runs after each capture)
+
 # Screenshot ONLY when:
 # - idle < 20 min
 # - active work time
@@ -84,12 +125,48 @@ SCREENSHOT_DURING_OVERTIME = True
 # ==================================================
 ERP_SYNC_INTERVAL_MIN = 10     # 🔥 AUTO PUSH every 10 minutes
 
+# HTTP client (erp_client.ErpClient – pooled keep-alive session)
+ERP_CONNECT_TIMEOUT_SEC = 5
+ERP_READ_TIMEOUT_SEC = 20
+ERP_MAX_RETRIES = 3            # on 429 / 5xx / connection errors
+ERP_BACKOFF_BASE_SEC = 1       # jittered: random(0, base × 2^attempt)
+ERP_BACKOFF_MAX_SEC = 30
+ERP_POOL_SIZE = 4              # keep-alive connections to ERP_BASE_URL
+
+# Push engine concurrency (days in parallel, one day stays ordered)
+ERP_PUSH_WORKERS = 4
+ERP_RATE_LIMIT_PER_SEC = 5     # token bucket: sustained requests / second
+ERP_RATE_BURST = 10            # token bucket: burst size
+
+# Circuit breaker (ERP offline → skip cycles cheaply, probe to resume)
+ERP_BREAKER_FAILURES = 3       # consecutive failures → open
+ERP_BREAKER_COOLDOWN_SEC = 30  # first cool-down, doubles per failed probe
+ERP_BREAKER_COOLDOWN_MAX_SEC = 900
+
+# Call instrumentation (erp_metrics – per endpoint, rolled up per day)
+ERP_METRICS_KEEP_DAYS = 14     # older erp_call_stats rows are pruned
+
 # ERP behavior:
 # - Check-IN → once per day (first_seen)
 # - Check-OUT → overwrite (last_seen)
 # - Timesheet → create once, update hours
 # - Attendance → later phase (from Checkin)
 
+# ==================================================
+# 💾 LOCAL WRITE POLICY
+# ==================================================
+# Activity log + daily_work writes are queued and committed
+# by a background writer thread (one fsync/commit per flush).
+LOG_FLUSH_INTERVAL_SEC = 120   # group-commit interval
+LOG_QUEUE_MAX = 1000           # bounded queue (≈ 8 h of ticks)
+
+# daily_work is only rewritten when the day changed, plus a forced
+# checkpoint at least this often (and always at day close)
+SAVE_CHECKPOINT_MIN = 15
+
+# Day logs older than this are compressed into activity_logs/YYYY-MM.zip
+LOG_ARCHIVE_AFTER_DAYS = 7
+
 # ==================================================
 # 🐞 DEBUG
 # ==================================================
@@ -1,29 +1,443 @@
+import random
+import threading
+import time
+
 import requests
-from config import ERP_BASE_URL, ERP_API_KEY, ERP_API_SECRET
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from config import (
+    ERP_BASE_URL,
+    ERP_API_KEY,
+    ERP_API_SECRET,
+    ERP_CONNECT_TIMEOUT_SEC,
+    ERP_READ_TIMEOUT_SEC,
+    ERP_MAX_RETRIES,
+    ERP_BACKOFF_BASE_SEC,
+    ERP_BACKOFF_MAX_SEC,
+    ERP_POOL_SIZE,
+    ERP_RATE_LIMIT_PER_SEC,
+    ERP_RATE_BURST,
+    ERP_BREAKER_FAILURES,
+    ERP_BREAKER_COOLDOWN_SEC,
+    ERP_BREAKER_COOLDOWN_MAX_SEC
+)
+from erp_metrics import metrics as default_metrics, erp_stage
 
+# ⚠️ No Content-Type here: json= / files= set the right one per request
 HEADERS = {
     "Authorization": f"token {ERP_API_KEY}:{ERP_API_SECRET}",
-    "Content-Type": "application/json",
     "Accept": "application/json"
 }
 
+# Retried responses (429 = rate limited, 5xx = server side)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# POST is not idempotent: only retry when the ERP surely did nothing
+POST_RETRY_STATUS = {429, 503}
+
+# Cheap endpoint used to probe a half-open circuit (Frappe whitelisted)
+PROBE_ENDPOINT = "/api/method/ping"
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """ERP marked unreachable: request not sent."""
+
+
+def _never_sent(error):
+    """
+    True when a connection error happened before the request reached
+    the ERP (connect timeout, DNS / refused connection) – the only
+    failures after which a POST may be resent without duplicating it.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)   # urllib3 MaxRetryError → cause
+    return isinstance(reason, NewConnectionError)
+
+
+# ==================================================
+# CIRCUIT BREAKER (ERP OFFLINE DETECTION)
+# ==================================================
+class CircuitBreaker:
+    """
+    closed    → requests flow; N consecutive failures → open
+    open      → requests fail fast until the cool-down ends → half-open
+    half_open → ONE probe request; success → closed,
+                failure → open again with doubled cool-down
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold=ERP_BREAKER_FAILURES,
+        cooldown=ERP_BREAKER_COOLDOWN_SEC,
+        max_cooldown=ERP_BREAKER_COOLDOWN_MAX_SEC
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._cooldown = cooldown
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        if self._state == self.OPEN and time.monotonic() >= self._open_until:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+    def _open(self):
+        self._state = self.OPEN
+        self._open_until = time.monotonic() + self._cooldown
+        self._probe_in_flight = False
+        print(f"🔌 ERP unreachable – circuit open for {self._cooldown:.0f}s")
+
+    # ------------------------------------------------
+    def state(self):
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def seconds_until_probe(self):
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self._open_until - time.monotonic())
+
+    def allow_request(self):
+        """
+        None → do not send. Otherwise the state the request is sent in
+        (HALF_OPEN → it is THE probe: its outcome must be reported via
+        record_success / record_failure / release_probe).
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return self.CLOSED
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return self.HALF_OPEN
+            return None
+
+    def release_probe(self):
+        """Probe ended without telling anything about the ERP (local error)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                print("✅ ERP reachable again – circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._cooldown = self.base_cooldown
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self._state == self.CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._open()
+
+
+# ==================================================
+# TOKEN BUCKET (ERP REQUEST BUDGET)
+# ==================================================
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens/second, up to `capacity`.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity):
+        # capacity < 1 never holds a whole token → acquire() would spin forever
+        if capacity < 1:
+            raise ValueError(f"TokenBucket capacity must be >= 1 (got {capacity})")
+        if rate <= 0:
+            raise ValueError(f"TokenBucket rate must be > 0 (got {rate})")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+# ==================================================
+# POOLED KEEP-ALIVE ERP CLIENT
+# ==================================================
+class ErpClient:
+    """
+    One requests.Session with a connection pool to ERP_BASE_URL:
+    TCP/TLS connections are reused across calls (keep-alive).
+
+    Retries 429/5xx and connection errors with jittered exponential
+    backoff (honours Retry-After). An optional TokenBucket keeps every
+    attempt inside the ERP request budget; an optional CircuitBreaker
+    fails fast while the ERP is unreachable.
+
+    Each call (retries included) is recorded in `metrics` (erp_metrics).
+    """
+
+    def __init__(
+        self,
+        headers=HEADERS,
+        session=None,
+        base_url=ERP_BASE_URL,
+        timeout=(ERP_CONNECT_TIMEOUT_SEC, ERP_READ_TIMEOUT_SEC),
+        max_retries=ERP_MAX_RETRIES,
+        pool_size=ERP_POOL_SIZE,
+        rate_limiter=None,
+        breaker=None,
+        metrics=default_metrics
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker
+        self.metrics = metrics
+
+        # Requests actually sent (incl. retries) – throughput reporting
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+        self.session = session or requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+
+        # Retries are handled below (with jitter), not by urllib3
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=0
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # ------------------------------------------------
+    def url(self, endpoint):
+        return endpoint if endpoint.startswith("http") else self.base_url + endpoint
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), ERP_BACKOFF_MAX_SEC)
+            except ValueError:
+                pass
+
+        # Full jitter: random(0, base * 2^attempt)
+        return random.uniform(0, min(ERP_BACKOFF_MAX_SEC, ERP_BACKOFF_BASE_SEC * (2 ** attempt)))
+
+    def request(self, method, endpoint, **kwargs):
+        """
+        Returns the final requests.Response (status NOT checked).
+        Raises requests.RequestException if every attempt failed
+        at the connection level (CircuitOpenError if not even sent).
+        """
+        started = time.perf_counter()
+
+        try:
+            r, retries = self._send(method, endpoint, kwargs)
+        except requests.RequestException as e:
+            self._record(method, endpoint, e.__class__.__name__, started, getattr(e, "attempts", 0))
+            raise
+
+        self._record(method, endpoint, r.status_code, started, retries, r)
+        return r
+
+    def _send(self, method, endpoint, kwargs):
+        """Breaker gate + retry loop. Returns (response, retries)."""
+        allowed = self.breaker.allow_request() if self.breaker else CircuitBreaker.CLOSED
+        if allowed is None:
+            raise CircuitOpenError(f"ERP circuit open – {method} {endpoint} not sent")
+
+        # Half-open probe: one attempt, no backoff – its outcome decides
+        max_retries = 0 if allowed == CircuitBreaker.HALF_OPEN else self.max_retries
+
+        # Every way out reports to the breaker, else a probe stays in flight forever
+        try:
+            r, retries = self._attempts(method, endpoint, kwargs, max_retries)
+        except requests.RequestException:
+            if self.breaker:
+                self.breaker.record_failure()
+            raise
+        except BaseException:
+            if self.breaker:
+                self.breaker.release_probe()
+            raise
+
+        if self.breaker:
+            # 4xx still proves the ERP is up; 5xx does not
+            if r.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        return r, retries
+
+    def _attempts(self, method, endpoint, kwargs, max_retries):
+        """Retry loop (no breaker bookkeeping). Returns (response, retries)."""
+        kwargs.setdefault("timeout", self.timeout)
+        retry_status = POST_RETRY_STATUS if method.upper() == "POST" else RETRY_STATUS
+        url = self.url(endpoint)
+
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            with self._count_lock:
+                self.request_count += 1
+
+            try:
+                r = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # Aborted / reset / timed out after sending: the POST may
+                # have created the document → never resent
+                if attempt >= max_retries or (
+                    method.upper() == "POST" and not _never_sent(e)
+                ):
+                    e.attempts = attempt
+                    raise
+                delay = self._backoff(attempt)
+                print(f"⚠️ ERP {method} {endpoint} failed ({e.__class__.__name__}), retry in {delay:.1f}s")
+            except requests.RequestException as e:
+                e.attempts = attempt
+                raise
+            else:
+                if r.status_code not in retry_status or attempt >= max_retries:
+                    return r, attempt
+                delay = self._backoff(attempt, r)
+                print(f"⚠️ ERP {method} {endpoint} → {r.status_code}, retry in {delay:.1f}s")
+
+            attempt += 1
+            time.sleep(delay)
+
+    def _record(self, method, endpoint, status, started, retries, response=None):
+        if not self.metrics:
+            return
+
+        bytes_out = bytes_in = 0
+        if response is not None:
+            body = response.request.body if response.request is not None else None
+            bytes_out = len(body) if body else 0
+            bytes_in = len(response.content or b"")
+
+        self.metrics.record(
+            method,
+            endpoint,
+            status,
+            (time.perf_counter() - started) * 1000,
+            bytes_out=bytes_out,
+            bytes_in=bytes_in,
+            retries=retries
+        )
+
+    def is_available(self):
+        """
+        False while the circuit is open. When the cool-down has ended,
+        sends the single half-open probe and returns its outcome.
+        """
+        if not self.breaker:
+            return True
+
+        state = self.breaker.state()
+        if state == CircuitBreaker.CLOSED:
+            return True
+        if state == CircuitBreaker.OPEN:
+            return False
+
+        try:
+            with erp_stage("probe"):
+                r = self.request("GET", PROBE_ENDPOINT)
+        except requests.RequestException:
+            return False
+        return r.status_code < 500
+
+    # ------------------------------------------------
+    # JSON helpers (raise on HTTP error)
+    # ------------------------------------------------
+    def get(self, endpoint, params=None):
+        r = self.request("GET", endpoint, params=params)
+        r.raise_for_status()
+        return r.json()
+
+    def post(self, endpoint, payload):
+        r = self.request("POST", endpoint, json=payload)
+        r.raise_for_status()
+        return r.json()
+
+    def put(self, endpoint, payload):
+        r = self.request("PUT", endpoint, json=payload)
+        r.raise_for_status()
+        return r.json()
+
+
+# ==================================================
+# SHARED DEFAULT CLIENT (API-key auth)
+# ==================================================
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ErpClient(
+                    rate_limiter=TokenBucket(ERP_RATE_LIMIT_PER_SEC, ERP_RATE_BURST),
+                    breaker=CircuitBreaker()
+                )
+    return _client
+
+
+def wrap_session(session):
+    """
+    ErpClient around an authenticated requests.Session (login cookies),
+    built once per session so its pooled adapter is mounted only once.
+    """
+    client = getattr(session, "_erp_client", None)
+    if client is None:
+        client = ErpClient(headers=None, session=session)
+        session._erp_client = client
+    return client
+
 
 def erp_get(endpoint, params=None):
-    url = ERP_BASE_URL + endpoint
-    r = requests.get(url, headers=HEADERS, params=params, timeout=20)
-    r.raise_for_status()
-    return r.json()
+    return get_client().get(endpoint, params=params)
 
 
 def erp_post(endpoint, payload):
-    url = ERP_BASE_URL + endpoint
-    r = requests.post(url, headers=HEADERS, json=payload, timeout=20)
-    r.raise_for_status()
-    return r.json()
+    return get_client().post(endpoint, payload)
 
 
 def erp_put(endpoint, payload):
-    url = ERP_BASE_URL + endpoint
-    r = requests.put(url, headers=HEADERS, json=payload, timeout=20)
-    r.raise_for_status()
-    return r.json()
+    return get_client().put(endpoint, payload)
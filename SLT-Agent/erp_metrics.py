@@ -0,0 +1,240 @@
+"""
+ERP call instrumentation.
+
+Every ErpClient.request() is recorded per (stage, method, endpoint
+template): latency histogram, status counts, bytes in/out, retries.
+Counters live in memory and are merged into local.db (erp_call_stats,
+one row per day) by flush().
+
+Stages name the part of a cycle a call belongs to:
+    with erp_stage("timesheet"):
+        erp_put(...)
+
+Report:
+    python erp_metrics.py [--days 7]
+"""
+import argparse
+import re
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from urllib.parse import urlsplit, unquote
+
+from config import ERP_METRICS_KEEP_DAYS
+from local_db import merge_call_stats, get_call_stats
+
+
+# Histogram upper bounds (ms); last bucket is "slower than all of these"
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+DEFAULT_STAGE = "other"
+
+_RESOURCE_RE = re.compile(r"^/api/resource/([^/]+)/.+$")
+_FILES_RE = re.compile(r"^/(private/)?files/.+$")
+
+
+def endpoint_template(endpoint):
+    """
+    '/api/resource/Timesheet/TS-0001?x=1' → '/api/resource/Timesheet/{name}'
+    (document names / file names / query strings are not cardinality we want)
+    """
+    path = unquote(urlsplit(endpoint).path) or "/"
+    path = _RESOURCE_RE.sub(r"/api/resource/\1/{name}", path)
+    return _FILES_RE.sub(lambda m: f"/{m.group(1) or ''}files/{{file}}", path)
+
+
+def bucket_index(elapsed_ms):
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if elapsed_ms <= bound:
+            return i
+    return len(LATENCY_BUCKETS_MS)
+
+
+def percentile_ms(buckets, pct):
+    """Upper bound of the bucket holding the pct-th call (None if empty)."""
+    total = sum(buckets)
+    if not total:
+        return None
+    rank = total * pct / 100
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= rank:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else float("inf")
+    return float("inf")
+
+
+# ==================================================
+# STAGE (THREAD-LOCAL, NESTABLE)
+# ==================================================
+_stage = threading.local()
+
+
+@contextmanager
+def erp_stage(name):
+    previous = getattr(_stage, "name", DEFAULT_STAGE)
+    _stage.name = name
+    try:
+        yield
+    finally:
+        _stage.name = previous
+
+
+def current_stage():
+    return getattr(_stage, "name", DEFAULT_STAGE)
+
+
+# ==================================================
+# IN-MEMORY COLLECTOR
+# ==================================================
+class ErpMetrics:
+    def __init__(self, keep_days=ERP_METRICS_KEEP_DAYS):
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        self._rows = {}
+
+    def record(self, method, endpoint, status, elapsed_ms, bytes_out=0, bytes_in=0, retries=0):
+        """
+        status: HTTP status code, or an exception class name when no
+        response came back (ConnectionError, CircuitOpenError, ...).
+        """
+        key = (current_stage(), method.upper(), endpoint_template(endpoint))
+        is_error = not isinstance(status, int) or status >= 400
+
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                row = self._rows[key] = {
+                    "calls": 0, "errors": 0, "retries": 0,
+                    "bytes_out": 0, "bytes_in": 0,
+                    "total_ms": 0.0, "max_ms": 0.0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                    "statuses": {}
+                }
+
+            row["calls"] += 1
+            row["errors"] += is_error
+            row["retries"] += retries
+            row["bytes_out"] += bytes_out
+            row["bytes_in"] += bytes_in
+            row["total_ms"] += elapsed_ms
+            row["max_ms"] = max(row["max_ms"], elapsed_ms)
+            row["buckets"][bucket_index(elapsed_ms)] += 1
+            row["statuses"][str(status)] = row["statuses"].get(str(status), 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: dict(row, buckets=list(row["buckets"]), statuses=dict(row["statuses"]))
+                for key, row in self._rows.items()
+            }
+
+    def flush(self):
+        """Merge collected counters into local.db; kept in memory on failure."""
+        with self._lock:
+            rows, self._rows = self._rows, {}
+
+        if not rows:
+            return
+
+        try:
+            merge_call_stats(date.today().isoformat(), rows, self.keep_days)
+        except Exception as e:
+            print("⚠️ ERP call stats flush failed (will retry):", e)
+            with self._lock:
+                for key, row in rows.items():
+                    self._merge_back(key, row)
+
+    def _merge_back(self, key, row):
+        current = self._rows.get(key)
+        if current is None:
+            self._rows[key] = row
+            return
+        for col in ("calls", "errors", "retries", "bytes_out", "bytes_in", "total_ms"):
+            current[col] += row[col]
+        current["max_ms"] = max(current["max_ms"], row["max_ms"])
+        current["buckets"] = [a + b for a, b in zip(current["buckets"], row["buckets"])]
+        for status, n in row["statuses"].items():
+            current["statuses"][status] = current["statuses"].get(status, 0) + n
+
+
+metrics = ErpMetrics()
+
+
+# ==================================================
+# CLI REPORT
+# ==================================================
+def summarize(rows):
+    """Roll day rows up to one row per (stage, method, endpoint)."""
+    merged = {}
+    for r in rows:
+        key = (r["stage"], r["method"], r["endpoint"])
+        m = merged.get(key)
+        if m is None:
+            merged[key] = dict(r, buckets=list(r["buckets"]), statuses=dict(r["statuses"]))
+            continue
+        for col in ("calls", "errors", "retries", "bytes_out", "bytes_in", "total_ms"):
+            m[col] += r[col]
+        m["max_ms"] = max(m["max_ms"], r["max_ms"])
+        m["buckets"] = [a + b for a, b in zip(m["buckets"], r["buckets"])]
+        for status, n in r["statuses"].items():
+            m["statuses"][status] = m["statuses"].get(status, 0) + n
+    return sorted(merged.values(), key=lambda m: m["total_ms"], reverse=True)
+
+
+def _fmt_ms(value):
+    if value is None:
+        return "-"
+    return ">10s" if value == float("inf") else f"≤{value}"
+
+
+def print_report(days=7):
+    rows = summarize(get_call_stats((date.today() - timedelta(days=days - 1)).isoformat()))
+
+    if not rows:
+        print(f"No ERP calls recorded in the last {days} day(s)")
+        return
+
+    total_ms = sum(r["total_ms"] for r in rows) or 1
+
+    print(f"\n📡 ERP calls – last {days} day(s), slowest total first")
+    print(f"{'stage':<10} {'endpoint':<44} {'calls':>6} {'err':>4} {'retry':>5} "
+          f"{'avg ms':>8} {'p50':>7} {'p95':>7} {'max ms':>8} {'KB out':>8} {'KB in':>8} {'time%':>6}")
+
+    for r in rows:
+        print(f"{r['stage']:<10} {(r['method'] + ' ' + r['endpoint'])[:44]:<44} "
+              f"{r['calls']:>6} {r['errors']:>4} {r['retries']:>5} "
+              f"{r['total_ms'] / r['calls']:>8.1f} "
+              f"{_fmt_ms(percentile_ms(r['buckets'], 50)):>7} "
+              f"{_fmt_ms(percentile_ms(r['buckets'], 95)):>7} "
+              f"{r['max_ms']:>8.1f} "
+              f"{r['bytes_out'] / 1024:>8.1f} {r['bytes_in'] / 1024:>8.1f} "
+              f"{100 * r['total_ms'] / total_ms:>5.1f}%")
+
+    # Which part of a push cycle dominates
+    stages = {}
+    for r in rows:
+        stages[r["stage"]] = stages.get(r["stage"], 0) + r["total_ms"]
+
+    print("\n⏱ Time per stage")
+    for stage, ms in sorted(stages.items(), key=lambda kv: kv[1], reverse=True):
+        print(f"  {stage:<10} {ms / 1000:>9.2f}s  {100 * ms / total_ms:>5.1f}%")
+
+    errors = {}
+    for r in rows:
+        for status, n in r["statuses"].items():
+            if not status.isdigit() or int(status) >= 400:
+                errors[status] = errors.get(status, 0) + n
+    if errors:
+        print("\n❌ Errors:", ", ".join(f"{s} × {n}" for s, n in sorted(errors.items())))
+
+
+if __name__ == "__main__":
+    from local_db import init_db
+
+    parser = argparse.ArgumentParser(description="SLT Agent ERP call report")
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    init_db()
+    print_report(args.days)
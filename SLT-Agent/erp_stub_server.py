@@ -0,0 +1,309 @@
+"""
+Local Frappe / ERPNext stand-in (offline testing & benchmarks).
+
+Implements only what the agent uses:
+- GET/POST         /api/resource/<Doctype>          (list + create)
+- GET/PUT          /api/resource/<Doctype>/<name>   (read + update)
+- POST             /api/method/upload_file
+- GET              /api/method/ping
+- GET              /api/method/frappe.auth.get_logged_user
+
+Run:
+    python erp_stub_server.py --port 8800 --latency 0.05 --error-rate 0.02 --rate-limit 20
+Then point the agent at it:
+    set ERP_BASE_URL_ENV=http://127.0.0.1:8800
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+
+STUB_USER = "bench.user@example.com"
+STUB_EMPLOYEE = {
+    "name": "HR-EMP-00001",
+    "employee_name": "Bench User",
+    "user_id": STUB_USER,
+    "company_email": STUB_USER,
+    "personal_email": None,
+    "department": "Engineering",
+    "designation": "Engineer",
+    "status": "Active"
+}
+
+NAME_PREFIX = {
+    "Employee": "HR-EMP-",
+    "Employee Checkin": "EMP-CKIN-",
+    "Timesheet": "TS-"
+}
+
+
+# ==================================================
+# IN-MEMORY ERP STATE + FAULT INJECTION
+# ==================================================
+class StubErp:
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit=None, seed=None):
+        self.latency = latency            # seconds added to every request
+        self.error_rate = error_rate      # fraction answered with 503
+        self.rate_limit = rate_limit      # requests/second (None = unlimited)
+
+        self.docs = {
+            "Employee": {STUB_EMPLOYEE["name"]: dict(STUB_EMPLOYEE)},
+            "Employee Checkin": {},
+            "Timesheet": {}
+        }
+        self.files = {}
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._tokens = float(rate_limit or 0)
+        self._refilled = time.monotonic()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.by_route = {}
+            self.by_status = {}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "by_route": dict(self.by_route),
+                "by_status": dict(self.by_status)
+            }
+
+    def count(self, route, status, bytes_in, bytes_out):
+        with self._lock:
+            self.requests += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.by_route[route] = self.by_route.get(route, 0) + 1
+            self.by_status[status] = self.by_status.get(status, 0) + 1
+
+    # ------------------------------------------------
+    def admit(self):
+        """None → serve; else (status, headers) to answer instead."""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    return 429, {"Retry-After": "1"}
+                self._tokens -= 1
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 503, {}
+
+        return None
+
+    def new_name(self, doctype):
+        with self._lock:
+            self._seq += 1
+            return f"{NAME_PREFIX.get(doctype, 'DOC-')}{self._seq:06d}"
+
+
+# ==================================================
+# FRAPPE-STYLE LIST FILTERS
+# ==================================================
+def _match(doc, filters):
+    for field, op, value in filters:
+        actual = doc.get(field)
+        if actual is None:
+            return False
+        actual, value = str(actual), str(value)
+        if op == "=" and actual != value:
+            return False
+        if op == "!=" and actual == value:
+            return False
+        if op == ">=" and actual < value:
+            return False
+        if op == "<=" and actual > value:
+            return False
+        if op == ">" and actual <= value:
+            return False
+        if op == "<" and actual >= value:
+            return False
+    return True
+
+
+def list_docs(docs, params):
+    filters = json.loads(params.get("filters", "[]"))
+    fields = json.loads(params.get("fields", '["name"]'))
+    start = int(params.get("limit_start", 0))
+    length = int(params.get("limit_page_length", params.get("limit", 20)))
+
+    rows = [d for d in docs.values() if _match(d, filters)]
+
+    order_by = params.get("order_by")
+    if order_by:
+        field, _, direction = order_by.partition(" ")
+        rows.sort(key=lambda d: str(d.get(field, "")), reverse=direction.strip().lower() == "desc")
+
+    rows = rows[start:start + length] if length else rows[start:]
+    if "*" in fields:
+        return rows
+    return [{f: d.get(f) for f in fields} for d in rows]
+
+
+# ==================================================
+# HTTP HANDLER
+# ==================================================
+RESOURCE_RE = re.compile(r"^/api/resource/([^/]+)(?:/(.+))?$")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real ERP
+    erp = None                      # StubErp, set by make_server()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    # ------------------------------------------------
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload, route, bytes_in, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.erp.count(route, status, bytes_in, len(body))
+
+    def _handle(self, method):
+        body = self._read_body()
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+        match = RESOURCE_RE.match(path)
+        if match:
+            route = f"/api/resource/{match.group(1)}" + ("/{name}" if match.group(2) else "")
+        else:
+            route = path
+        route = f"{method} {route}"
+
+        rejected = self.erp.admit()
+        if rejected:
+            status, headers = rejected
+            return self._send(status, {"exc_type": "ServiceUnavailable"}, route, len(body), headers)
+
+        try:
+            status, payload = self._dispatch(method, path, match, params, body)
+        except (ValueError, KeyError) as e:
+            status, payload = 417, {"exc_type": "ValidationError", "exception": str(e)}
+
+        self._send(status, payload, route, len(body))
+
+    def _dispatch(self, method, path, match, params, body):
+        if path == "/api/method/ping":
+            return 200, {"message": "pong"}
+
+        if path in ("/api/method/frappe.auth.get_logged_user", "/api/method/frappe.sessions.get_current_user"):
+            return 200, {"message": STUB_USER}
+
+        if path == "/api/method/upload_file" and method == "POST":
+            found = re.search(rb'filename="([^"]+)"', body)
+            filename = found.group(1).decode("utf-8", "replace") if found else "upload.bin"
+            file_url = f"/private/files/{filename}"
+            self.erp.files[file_url] = len(body)
+            return 200, {"message": {"file_url": file_url, "file_name": filename}}
+
+        if not match:
+            return 404, {"exc_type": "DoesNotExistError"}
+
+        doctype, name = match.group(1), match.group(2)
+        docs = self.erp.docs.setdefault(doctype, {})
+
+        if method == "GET" and not name:
+            return 200, {"data": list_docs(docs, params)}
+
+        if method == "GET":
+            if name not in docs:
+                return 404, {"exc_type": "DoesNotExistError"}
+            return 200, {"data": docs[name]}
+
+        data = json.loads(body or b"{}")
+
+        if method == "POST" and not name:
+            doc = dict(data, name=self.erp.new_name(doctype), doctype=doctype)
+            docs[doc["name"]] = doc
+            return 200, {"data": doc}
+
+        if method == "PUT" and name:
+            if name not in docs:
+                return 404, {"exc_type": "DoesNotExistError"}
+            docs[name].update(data)
+            return 200, {"data": docs[name]}
+
+        return 405, {"exc_type": "MethodNotAllowed"}
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+
+# ==================================================
+# PUBLIC HELPERS
+# ==================================================
+def make_server(erp=None, host="127.0.0.1", port=0):
+    """
+    Returns (server, erp). port=0 picks a free port:
+    url = f"http://{host}:{server.server_port}"
+    """
+    erp = erp or StubErp()
+    handler = type("BoundStubHandler", (StubHandler,), {"erp": erp})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, erp
+
+
+def start_in_background(erp=None, host="127.0.0.1", port=0):
+    server, erp = make_server(erp, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, erp, f"http://{host}:{server.server_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local ERPNext stand-in for SLT Agent")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 answers")
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests/second before 429")
+    args = parser.parse_args()
+
+    server, _ = make_server(
+        StubErp(args.latency, args.error_rate, args.rate_limit),
+        args.host,
+        args.port
+    )
+    print(f"🧪 ERP stand-in listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,180 @@
+import os
+import shutil
+import subprocess
+import sys
+from collections import namedtuple
+
+from config import APP_TRACKING_BACKEND, APP_TRACK_TITLES, APP_TITLE_MAX_LEN
+
+
+# Foreground window at sample time (process: executable name, e.g. "chrome.exe")
+ForegroundWindow = namedtuple("ForegroundWindow", ["process", "title"])
+
+
+def _window(process, title):
+    process = (process or "").strip() or "unknown"
+    title = (title or "").strip()[:APP_TITLE_MAX_LEN] if APP_TRACK_TITLES else ""
+    return ForegroundWindow(process, title)
+
+
+# ==================================================
+# BACKENDS (one sample() per agent tick)
+# ==================================================
+# sample() → ForegroundWindow, or None when there is no foreground
+# window (locked screen, secure desktop, no display).
+class NullBackend:
+    """App tracking off / platform not supported."""
+    name = "none"
+
+    def sample(self):
+        return None
+
+
+class WindowsBackend:
+    """user32 foreground window + QueryFullProcessImageNameW (ctypes)."""
+    name = "windows"
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    MAX_PATH = 260
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        self._ctypes = ctypes
+        self._wintypes = wintypes
+
+        user32 = ctypes.WinDLL("user32", use_last_error=True)
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+        # Explicit signatures: HWND / HANDLE are pointer-sized on 64-bit
+        user32.GetForegroundWindow.restype = wintypes.HWND
+        user32.GetForegroundWindow.argtypes = []
+        user32.GetWindowTextLengthW.argtypes = [wintypes.HWND]
+        user32.GetWindowTextW.argtypes = [wintypes.HWND, wintypes.LPWSTR, ctypes.c_int]
+        user32.GetWindowThreadProcessId.restype = wintypes.DWORD
+        user32.GetWindowThreadProcessId.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.DWORD)]
+
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+        kernel32.QueryFullProcessImageNameW.argtypes = [
+            wintypes.HANDLE, wintypes.DWORD, wintypes.LPWSTR, ctypes.POINTER(wintypes.DWORD)
+        ]
+        kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+        self._user32 = user32
+        self._kernel32 = kernel32
+
+    def _process_name(self, pid):
+        handle = self._kernel32.OpenProcess(self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None   # elevated / protected process
+        try:
+            size = self._wintypes.DWORD(self.MAX_PATH)
+            buf = self._ctypes.create_unicode_buffer(self.MAX_PATH)
+            if self._kernel32.QueryFullProcessImageNameW(handle, 0, buf, self._ctypes.byref(size)):
+                return os.path.basename(buf.value)
+            return None
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+    def sample(self):
+        hwnd = self._user32.GetForegroundWindow()
+        if not hwnd:
+            return None
+
+        length = self._user32.GetWindowTextLengthW(hwnd)
+        title = self._ctypes.create_unicode_buffer(length + 1)
+        self._user32.GetWindowTextW(hwnd, title, length + 1)
+
+        pid = self._wintypes.DWORD()
+        self._user32.GetWindowThreadProcessId(hwnd, self._ctypes.byref(pid))
+
+        return _window(self._process_name(pid.value), title.value)
+
+
+class X11Backend:
+    """
+    Linux stand-in: active window via `xprop` (EWMH _NET_ACTIVE_WINDOW),
+    process name from /proc/<pid>/comm.
+    """
+    name = "x11"
+    TIMEOUT_SEC = 2
+
+    def __init__(self):
+        self._xprop = shutil.which("xprop")
+        if not self._xprop:
+            raise RuntimeError("xprop not found")
+
+    @staticmethod
+    def available():
+        return bool(os.environ.get("DISPLAY")) and shutil.which("xprop") is not None
+
+    def _xprop_props(self, *args):
+        out = subprocess.run(
+            [self._xprop, *args],
+            capture_output=True,
+            text=True,
+            timeout=self.TIMEOUT_SEC
+        ).stdout
+
+        # NAME(TYPE) = value   /   NAME(WINDOW): window id # 0x...
+        props = {}
+        for line in out.splitlines():
+            name, sep, value = line.partition("=")
+            if not sep:
+                name, sep, value = line.partition(":")
+            props[name.split("(", 1)[0].strip()] = value.strip()
+        return props
+
+    @staticmethod
+    def _proc_name(pid):
+        try:
+            with open(f"/proc/{int(pid)}/comm", "r", encoding="utf-8", errors="replace") as f:
+                return f.read().strip()
+        except (OSError, ValueError):
+            return None
+
+    def sample(self):
+        active = self._xprop_props("-root", "_NET_ACTIVE_WINDOW").get("_NET_ACTIVE_WINDOW", "")
+        wid = active.rsplit(None, 1)[-1] if "#" in active else ""
+        if not wid or int(wid, 16) == 0:
+            return None
+
+        props = self._xprop_props("-id", wid, "_NET_WM_PID", "_NET_WM_NAME", "WM_NAME")
+        title = props.get("_NET_WM_NAME") or props.get("WM_NAME") or ""
+        if title.startswith('"') and title.endswith('"'):
+            title = title[1:-1].replace('\\"', '"')
+
+        pid = props.get("_NET_WM_PID", "")
+        return _window(self._proc_name(pid) if pid.isdigit() else None, title)
+
+
+BACKENDS = {
+    "windows": WindowsBackend,
+    "x11": X11Backend,
+    "none": NullBackend
+}
+
+
+def get_backend(name=APP_TRACKING_BACKEND):
+    """
+    name : "auto" / "windows" / "x11" / "none"
+    Falls back to NullBackend (tracking off) when the backend cannot start.
+    """
+    if name == "auto":
+        if sys.platform == "win32":
+            name = "windows"
+        elif X11Backend.available():
+            name = "x11"
+        else:
+            name = "none"
+
+    try:
+        backend = BACKENDS[name]()
+    except Exception as e:
+        print(f"⚠️ App tracking backend '{name}' unavailable:", e)
+        return NullBackend()
+
+    print(f"🪟 App tracking backend: {backend.name}")
+    return backend
@@ -1,12 +1,44 @@
+import json
 import sqlite3
-from config import DB_PATH
+import threading
+from itertools import zip_longest
+from datetime import date, datetime, time, timedelta
+from config import DB_PATH, APP_TITLES_PER_DAY
 
 
 # --------------------------------------------------
 # DB Connection (safe for background agent)
 # --------------------------------------------------
+# One long-lived connection PER THREAD (agent writer, ERP sync, ...).
+# WAL lets readers run while the writer commits, so the ERP sync
+# thread / dashboard never block the agent (and vice versa).
+BUSY_TIMEOUT_SEC = 10          # wait this long on a locked DB, then raise
+STATEMENT_CACHE_SIZE = 64      # prepared statements kept per connection
+
+_local = threading.local()
+
+
 def get_conn():
-    return sqlite3.connect(DB_PATH, timeout=10)
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(
+            DB_PATH,
+            timeout=BUSY_TIMEOUT_SEC,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: durable across app crashes, fsync only at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    return conn
+
+
+def close_conn():
+    """Close this thread's connection (thread exit / shutdown)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
 
 
 # --------------------------------------------------
@@ -36,15 +68,214 @@ def init_db():
     if "last_seen" not in existing_cols:
         cur.execute("ALTER TABLE daily_work ADD COLUMN last_seen TEXT")
 
+    # Fine-grained timeline: runs of identical state merged into one row
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS activity_intervals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_ts TEXT NOT NULL,
+            end_ts TEXT NOT NULL,
+            state TEXT NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_activity_intervals_start
+        ON activity_intervals (start_ts)
+    """)
+
+    # ERP sync outbox: one row per (work_date, ERP document)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS erp_outbox (
+            work_date TEXT NOT NULL,
+            doc_type TEXT NOT NULL,
+            payload_hash TEXT,
+            erp_name TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            last_attempt TEXT,
+            synced_at TEXT,
+            PRIMARY KEY (work_date, doc_type)
+        )
+    """)
+
+    # Per-day push state: fingerprint of the daily_work row last pushed
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS erp_day_sync (
+            work_date TEXT PRIMARY KEY,
+            fingerprint TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            pushed_at TEXT,
+            last_error TEXT
+        )
+    """)
+
+    # ERP call instrumentation: one rolled-up row per day + stage + endpoint
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS erp_call_stats (
+            day TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            method TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            calls INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0,
+            retries INTEGER NOT NULL DEFAULT 0,
+            bytes_out INTEGER NOT NULL DEFAULT 0,
+            bytes_in INTEGER NOT NULL DEFAULT 0,
+            total_ms REAL NOT NULL DEFAULT 0,
+            max_ms REAL NOT NULL DEFAULT 0,
+            buckets TEXT,
+            statuses TEXT,
+            PRIMARY KEY (day, stage, method, endpoint)
+        )
+    """)
+
+    # Screenshot store index + upload queue: one row per stored image
+    # (path relative to SCREENSHOT_DIR). Also the running size index
+    # used by the quota manager (screenshot_quota.py).
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS screenshot_uploads (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            file_url TEXT,
+            last_error TEXT,
+            queued_at TEXT,
+            uploaded_at TEXT,
+            created_at TEXT
+        )
+    """)
+
+    upload_cols = [row[1] for row in cur.execute("PRAGMA table_info(screenshot_uploads)")]
+    if "created_at" not in upload_cols:
+        cur.execute("ALTER TABLE screenshot_uploads ADD COLUMN created_at TEXT")
+        cur.execute("UPDATE screenshot_uploads SET created_at = queued_at")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_screenshot_uploads_status
+        ON screenshot_uploads (status, path)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_screenshot_uploads_created
+        ON screenshot_uploads (created_at)
+    """)
+
+    # Effective agent settings other readers need (dashboard: quota)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS agent_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TEXT
+        )
+    """)
+
+    # App usage: interned process names, runs of minutes per process,
+    # window titles rolled up per day (one row per distinct title)
+    # First layout interned (process, title) pairs → one run per title;
+    # its tables are renamed, copied into the current layout, then dropped
+    name_cols = [row[1] for row in cur.execute("PRAGMA table_info(app_names)")]
+    migrate_app_pairs = "title" in name_cols
+    if migrate_app_pairs:
+        conn.commit()
+        cur.execute("BEGIN")
+        cur.execute("DROP INDEX IF EXISTS idx_app_usage_day")
+        cur.execute("ALTER TABLE app_names RENAME TO app_names_v1")
+        cur.execute("ALTER TABLE app_usage RENAME TO app_usage_v1")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS app_names (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS app_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            day TEXT NOT NULL,
+            start_min INTEGER NOT NULL,
+            end_min INTEGER NOT NULL,
+            app_id INTEGER NOT NULL,
+            seconds INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_app_usage_day
+        ON app_usage (day, app_id)
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS app_titles (
+            day TEXT NOT NULL,
+            app_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, app_id, title)
+        )
+    """)
+
+    if migrate_app_pairs:
+        try:
+            _copy_app_pairs(cur)
+        except Exception:
+            conn.rollback()
+            raise
+
     conn.commit()
-    conn.close()
 
-    print("✅ Local DB initialized / upgraded (daily_work)")
+    print("✅ Local DB initialized / upgraded (daily_work, activity_intervals, erp_outbox, erp_day_sync, erp_call_stats, screenshot_uploads, agent_settings, app_usage, app_titles)")
+
+
+def _copy_app_pairs(cur):
+    """app_names_v1 / app_usage_v1 (process + title per id) → current layout."""
+    cur.execute("""
+        INSERT OR IGNORE INTO app_names (name)
+        SELECT DISTINCT process FROM app_names_v1
+    """)
+    cur.execute("""
+        INSERT INTO app_usage (day, start_min, end_min, app_id, seconds)
+        SELECT u.day, u.start_min, u.end_min, n.id, u.seconds
+        FROM app_usage_v1 u
+        JOIN app_names_v1 o ON o.id = u.app_id
+        JOIN app_names n ON n.name = o.process
+        ORDER BY u.id
+    """)
+    cur.execute("""
+        INSERT INTO app_titles (day, app_id, title, seconds)
+        SELECT u.day, n.id, o.title, SUM(u.seconds)
+        FROM app_usage_v1 u
+        JOIN app_names_v1 o ON o.id = u.app_id
+        JOIN app_names n ON n.name = o.process
+        WHERE o.title != ''
+        GROUP BY u.day, n.id, o.title
+    """)
+    cur.execute("DROP TABLE app_usage_v1")
+    cur.execute("DROP TABLE app_names_v1")
 
 
 # --------------------------------------------------
 # Save / Update Day (called EVERY MINUTE by agent)
 # --------------------------------------------------
+UPSERT_DAY_SQL = """
+    INSERT INTO daily_work (
+        work_date,
+        normal_seconds,
+        ot_seconds,
+        first_seen,
+        last_seen
+    )
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(work_date)
+    DO UPDATE SET
+        normal_seconds = excluded.normal_seconds,
+        ot_seconds     = excluded.ot_seconds,
+
+        -- first_seen is set ONLY ONCE (first activity)
+        first_seen = COALESCE(daily_work.first_seen, excluded.first_seen),
+
+        -- last_seen ALWAYS moves forward (latest activity)
+        last_seen  = excluded.last_seen
+"""
+
+
 def save_day(work_date, normal_sec, ot_sec, first_seen, last_seen):
     """
     work_date   : YYYY-MM-DD
@@ -53,36 +284,683 @@ def save_day(work_date, normal_sec, ot_sec, first_seen, last_seen):
     first_seen  : YYYY-MM-DD HH:MM:SS or None
     last_seen   : YYYY-MM-DD HH:MM:SS or None
     """
+    save_days([(work_date, normal_sec, ot_sec, first_seen, last_seen)])
+
 
+def save_days(rows):
+    """
+    Upsert many days in ONE transaction (group commit).
+    rows : iterable of (work_date, normal_sec, ot_sec, first_seen, last_seen)
+    """
     conn = get_conn()
-    cur = conn.cursor()
 
-    cur.execute("""
-        INSERT INTO daily_work (
-            work_date,
-            normal_seconds,
-            ot_seconds,
-            first_seen,
-            last_seen
+    with conn:
+        conn.executemany(UPSERT_DAY_SQL, rows)
+
+
+# --------------------------------------------------
+# Activity intervals (start, end, state)
+# --------------------------------------------------
+# state     : work | idle | break | lunch | uncounted | suspended
+# timestamps: YYYY-MM-DD HH:MM:SS (same format as first_seen/last_seen)
+#
+# Intervals never cross midnight, so any interval overlapping a window
+# starts at most one day before it → the start_ts index bounds every scan.
+INTERVAL_STATES = ("work", "idle", "break", "lunch", "uncounted", "suspended")
+
+
+def _last_interval(conn):
+    return conn.execute("""
+        SELECT id, start_ts, end_ts, state
+        FROM activity_intervals
+        ORDER BY start_ts DESC, id DESC
+        LIMIT 1
+    """).fetchone()
+
+
+def save_intervals(ops):
+    """
+    Apply interval ops in ONE transaction.
+    ops : iterable of
+        ("add", start_ts, end_ts, state)   → extend last run or start a new one
+        ("relabel", state)                 → re-classify the open idle run
+    """
+    conn = get_conn()
+
+    with conn:
+        for op in ops:
+            last = _last_interval(conn)
+
+            if op[0] == "relabel":
+                if last and last[3] in ("idle", "break"):
+                    conn.execute(
+                        "UPDATE activity_intervals SET state = ? WHERE id = ?",
+                        (op[1], last[0])
+                    )
+                continue
+
+            _, start_ts, end_ts, state = op
+
+            if (
+                last
+                and last[3] == state
+                and last[2] >= start_ts
+                and last[1][:10] == end_ts[:10]
+            ):
+                conn.execute(
+                    "UPDATE activity_intervals SET end_ts = ? WHERE id = ?",
+                    (max(last[2], end_ts), last[0])
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO activity_intervals (start_ts, end_ts, state) VALUES (?, ?, ?)",
+                    (start_ts, end_ts, state)
+                )
+
+
+def get_intervals(start_ts, end_ts, states=None):
+    """
+    Spans overlapping [start_ts, end_ts), clipped to the window.
+    Returns list of (start_ts, end_ts, state) ordered by start.
+    """
+    sql = """
+        SELECT MAX(start_ts, :start), MIN(end_ts, :end), state
+        FROM activity_intervals
+        WHERE start_ts >= datetime(:start, '-1 day')
+          AND start_ts < :end
+          AND end_ts > :start
+    """
+    params = {"start": start_ts, "end": end_ts}
+
+    if states:
+        names = [f"s{i}" for i in range(len(states))]
+        sql += " AND state IN (%s)" % ", ".join(f":{n}" for n in names)
+        params.update(zip(names, states))
+
+    return get_conn().execute(sql + " ORDER BY start_ts", params).fetchall()
+
+
+def summarize_intervals(start_ts, end_ts):
+    """
+    Seconds per state inside [start_ts, end_ts).
+    """
+    rows = get_conn().execute("""
+        SELECT state,
+               SUM(strftime('%s', MIN(end_ts, :end)) - strftime('%s', MAX(start_ts, :start)))
+        FROM activity_intervals
+        WHERE start_ts >= datetime(:start, '-1 day')
+          AND start_ts < :end
+          AND end_ts > :start
+        GROUP BY state
+    """, {"start": start_ts, "end": end_ts}).fetchall()
+
+    totals = {state: 0 for state in INTERVAL_STATES}
+    totals.update({state: int(sec or 0) for state, sec in rows})
+    return totals
+
+
+def summarize_daily_window(from_date, to_date, from_time, to_time):
+    """
+    Same time-of-day window over a date range, e.g.
+    "14:00 → 16:00 every day of the last month".
+
+    from_date / to_date : YYYY-MM-DD (inclusive)
+    from_time / to_time : HH:MM[:SS]
+    Returns {work_date: {state: seconds}} for days with any data.
+    """
+    start = date.fromisoformat(from_date)
+    end = date.fromisoformat(to_date)
+    from_time = time.fromisoformat((from_time + ":00")[:8])
+    to_time = time.fromisoformat((to_time + ":00")[:8])
+    if start > end or from_time >= to_time:
+        return {}
+
+    first_ts = f"{start} {from_time}"
+    last_ts = f"{end} {to_time}"
+
+    # One indexed range scan for the whole date range; clipped per day below
+    rows = get_conn().execute("""
+        SELECT start_ts, end_ts, state
+        FROM activity_intervals
+        WHERE start_ts >= datetime(:start, '-1 day')
+          AND start_ts < :end
+          AND end_ts > :start
+    """, {"start": first_ts, "end": last_ts}).fetchall()
+
+    seconds = {}
+    for start_ts, end_ts, state in rows:
+        span_start = datetime.fromisoformat(start_ts)
+        span_end = datetime.fromisoformat(end_ts)
+
+        day = max(span_start.date(), start)
+        while day <= min(span_end.date(), end):
+            lo = max(span_start, datetime.combine(day, from_time))
+            hi = min(span_end, datetime.combine(day, to_time))
+            if hi > lo:
+                totals = seconds.setdefault(str(day), {})
+                totals[state] = totals.get(state, 0) + (hi - lo).total_seconds()
+            day += timedelta(days=1)
+
+    result = {}
+    for work_date in sorted(seconds):
+        totals = {state: 0 for state in INTERVAL_STATES}
+        totals.update({state: int(sec) for state, sec in seconds[work_date].items()})
+        if any(totals.values()):
+            result[work_date] = totals
+
+    return result
+
+
+# --------------------------------------------------
+# ERP outbox (what was pushed, per day + document)
+# --------------------------------------------------
+# doc_type     : IN | OUT | Timesheet
+# payload_hash : hash of the last payload sent (idempotency key)
+# erp_name     : ERP document name (e.g. EMP-CKIN-01-2026-000123)
+# status       : pending | synced | failed
+OUTBOX_DOC_TYPES = ("IN", "OUT", "Timesheet")
+
+
+def _now_str():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def get_outbox(work_date):
+    """
+    Returns {doc_type: {payload_hash, erp_name, status, attempts, last_error, ...}}
+    """
+    conn = get_conn()
+    cur = conn.execute("""
+        SELECT doc_type, payload_hash, erp_name, status, attempts,
+               last_error, last_attempt, synced_at
+        FROM erp_outbox
+        WHERE work_date = ?
+    """, (work_date,))
+
+    cols = [c[0] for c in cur.description]
+    return {row[0]: dict(zip(cols, row)) for row in cur.fetchall()}
+
+
+def record_push(work_date, doc_type, payload_hash, erp_name):
+    """Successful push of one ERP document."""
+    now = _now_str()
+    conn = get_conn()
+
+    with conn:
+        conn.execute("""
+            INSERT INTO erp_outbox (
+                work_date, doc_type, payload_hash, erp_name,
+                status, attempts, last_error, last_attempt, synced_at
+            )
+            VALUES (?, ?, ?, ?, 'synced', 1, NULL, ?, ?)
+            ON CONFLICT(work_date, doc_type)
+            DO UPDATE SET
+                payload_hash = excluded.payload_hash,
+                erp_name     = COALESCE(excluded.erp_name, erp_outbox.erp_name),
+                status       = 'synced',
+                attempts     = erp_outbox.attempts + 1,
+                last_error   = NULL,
+                last_attempt = excluded.last_attempt,
+                synced_at    = excluded.synced_at
+        """, (work_date, doc_type, payload_hash, erp_name, now, now))
+
+
+def record_push_error(work_date, doc_type, payload_hash, error):
+    """Failed push of one ERP document (kept for retry)."""
+    conn = get_conn()
+
+    with conn:
+        conn.execute("""
+            INSERT INTO erp_outbox (
+                work_date, doc_type, payload_hash,
+                status, attempts, last_error, last_attempt
+            )
+            VALUES (?, ?, ?, 'failed', 1, ?, ?)
+            ON CONFLICT(work_date, doc_type)
+            DO UPDATE SET
+                payload_hash = excluded.payload_hash,
+                status       = 'failed',
+                attempts     = erp_outbox.attempts + 1,
+                last_error   = excluded.last_error,
+                last_attempt = excluded.last_attempt
+        """, (work_date, doc_type, payload_hash, str(error)[:500], _now_str()))
+
+
+# ---- ERP document name cache (erp_outbox.erp_name) ----
+# Filled from POST responses; cleared only on 404 or explicit reconcile.
+def set_doc_name(work_date, doc_type, erp_name):
+    conn = get_conn()
+
+    with conn:
+        conn.execute("""
+            INSERT INTO erp_outbox (work_date, doc_type, erp_name)
+            VALUES (?, ?, ?)
+            ON CONFLICT(work_date, doc_type)
+            DO UPDATE SET erp_name = excluded.erp_name
+        """, (work_date, doc_type, erp_name))
+
+
+def clear_doc_name(work_date, doc_type=None):
+    """
+    Forget cached ERP name(s) of a day. The document is then pushed
+    again (payload_hash reset) after a fresh ERP lookup.
+    """
+    conn = get_conn()
+    sql = "UPDATE erp_outbox SET erp_name = NULL, payload_hash = NULL WHERE work_date = ?"
+    params = [work_date]
+
+    if doc_type:
+        sql += " AND doc_type = ?"
+        params.append(doc_type)
+
+    with conn:
+        conn.execute(sql, params)
+        # Day must be pushed again on the next cycle
+        conn.execute(
+            "UPDATE erp_day_sync SET status = 'pending' WHERE work_date = ?",
+            (work_date,)
         )
-        VALUES (?, ?, ?, ?, ?)
-        ON CONFLICT(work_date)
-        DO UPDATE SET
-            normal_seconds = excluded.normal_seconds,
-            ot_seconds     = excluded.ot_seconds,
-
-            -- first_seen is set ONLY ONCE (first activity)
-            first_seen = COALESCE(daily_work.first_seen, excluded.first_seen),
-
-            -- last_seen ALWAYS moves forward (latest activity)
-            last_seen  = excluded.last_seen
-    """, (
-        work_date,
-        normal_sec,
-        ot_sec,
-        first_seen,
-        last_seen
-    ))
 
-    conn.commit()
-    conn.close()
+
+def get_unsynced():
+    """
+    Closed days with at least one ERP document not synced.
+    Returns list of (work_date, normal_seconds, ot_seconds).
+    """
+    return get_conn().execute("""
+        SELECT d.work_date, d.normal_seconds, d.ot_seconds
+        FROM daily_work d
+        WHERE d.work_date < ?
+          AND d.first_seen IS NOT NULL
+          AND d.last_seen IS NOT NULL
+          AND (
+              SELECT COUNT(*) FROM erp_outbox o
+              WHERE o.work_date = d.work_date AND o.status = 'synced'
+          ) < ?
+        ORDER BY d.work_date
+    """, (date.today().isoformat(), len(OUTBOX_DOC_TYPES))).fetchall()
+
+
+def mark_synced(work_date):
+    """Mark every ERP document of a day as synced (no payload info)."""
+    now = _now_str()
+    conn = get_conn()
+
+    with conn:
+        conn.executemany("""
+            INSERT INTO erp_outbox (work_date, doc_type, status, last_attempt, synced_at)
+            VALUES (?, ?, 'synced', ?, ?)
+            ON CONFLICT(work_date, doc_type)
+            DO UPDATE SET
+                status     = 'synced',
+                last_error = NULL,
+                synced_at  = excluded.synced_at
+        """, [(work_date, doc, now, now) for doc in OUTBOX_DOC_TYPES])
+
+
+# --------------------------------------------------
+# Incremental push (per-day content fingerprint)
+# --------------------------------------------------
+# Canonical text of everything the ERP receives for a day.
+# Computed in SQL so unchanged days are filtered out by the query itself.
+DAY_FINGERPRINT_SQL = """
+    d.normal_seconds || '|' || d.ot_seconds || '|' ||
+    COALESCE(d.first_seen, '') || '|' || COALESCE(d.last_seen, '')
+"""
+
+
+def get_days_to_push(before_date):
+    """
+    Closed days (work_date < before_date) whose data changed since the
+    last successful push, or whose last push failed / never happened.
+    Returns list of (work_date, normal_sec, ot_sec, first_seen, last_seen, fingerprint).
+    """
+    return get_conn().execute(f"""
+        SELECT
+            d.work_date,
+            d.normal_seconds,
+            d.ot_seconds,
+            d.first_seen,
+            d.last_seen,
+            {DAY_FINGERPRINT_SQL} AS fp
+        FROM daily_work d
+        LEFT JOIN erp_day_sync s ON s.work_date = d.work_date
+        WHERE d.first_seen IS NOT NULL
+          AND d.last_seen IS NOT NULL
+          AND d.work_date < ?
+          AND (
+              s.work_date IS NULL
+              OR s.status != 'synced'
+              OR s.fingerprint != {DAY_FINGERPRINT_SQL}
+          )
+        ORDER BY d.work_date
+    """, (before_date,)).fetchall()
+
+
+def record_day_push(work_date, fingerprint, error=None):
+    """Result of pushing one day (error=None → success)."""
+    conn = get_conn()
+
+    with conn:
+        conn.execute("""
+            INSERT INTO erp_day_sync (work_date, fingerprint, status, pushed_at, last_error)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(work_date)
+            DO UPDATE SET
+                fingerprint = excluded.fingerprint,
+                status      = excluded.status,
+                pushed_at   = COALESCE(excluded.pushed_at, erp_day_sync.pushed_at),
+                last_error  = excluded.last_error
+        """, (
+            work_date,
+            fingerprint,
+            "failed" if error else "synced",
+            None if error else _now_str(),
+            str(error)[:500] if error else None
+        ))
+
+
+# --------------------------------------------------
+# ERP call stats (see erp_metrics.py)
+# --------------------------------------------------
+# buckets / statuses are JSON: histogram counts and {status: count}
+CALL_STAT_COLUMNS = (
+    "calls", "errors", "retries", "bytes_out", "bytes_in",
+    "total_ms", "max_ms", "buckets", "statuses"
+)
+
+
+def merge_call_stats(day, rows, keep_days):
+    """
+    Add in-memory deltas to the day's rows and prune rows older than
+    keep_days. rows: {(stage, method, endpoint): {column: value}}.
+    """
+    conn = get_conn()
+    oldest = (date.fromisoformat(day) - timedelta(days=keep_days)).isoformat()
+
+    with conn:
+        for (stage, method, endpoint), delta in rows.items():
+            row = conn.execute(f"""
+                SELECT {", ".join(CALL_STAT_COLUMNS)}
+                FROM erp_call_stats
+                WHERE day = ? AND stage = ? AND method = ? AND endpoint = ?
+            """, (day, stage, method, endpoint)).fetchone()
+
+            merged = dict(delta)
+            if row:
+                old = dict(zip(CALL_STAT_COLUMNS, row))
+                for col in ("calls", "errors", "retries", "bytes_out", "bytes_in", "total_ms"):
+                    merged[col] += old[col]
+                merged["max_ms"] = max(merged["max_ms"], old["max_ms"])
+
+                buckets = json.loads(old["buckets"] or "[]")
+                merged["buckets"] = [
+                    a + b for a, b in zip_longest(merged["buckets"], buckets, fillvalue=0)
+                ]
+                statuses = json.loads(old["statuses"] or "{}")
+                for status, n in merged["statuses"].items():
+                    statuses[status] = statuses.get(status, 0) + n
+                merged["statuses"] = statuses
+
+            conn.execute(f"""
+                INSERT OR REPLACE INTO erp_call_stats
+                    (day, stage, method, endpoint, {", ".join(CALL_STAT_COLUMNS)})
+                VALUES (?, ?, ?, ?, {", ".join("?" * len(CALL_STAT_COLUMNS))})
+            """, (day, stage, method, endpoint, *[
+                json.dumps(merged[col]) if col in ("buckets", "statuses") else merged[col]
+                for col in CALL_STAT_COLUMNS
+            ]))
+
+        conn.execute("DELETE FROM erp_call_stats WHERE day < ?", (oldest,))
+
+
+def get_call_stats(from_day):
+    """Rows since from_day as dicts (buckets / statuses decoded)."""
+    cur = get_conn().execute(f"""
+        SELECT day, stage, method, endpoint, {", ".join(CALL_STAT_COLUMNS)}
+        FROM erp_call_stats
+        WHERE day >= ?
+        ORDER BY day, stage, endpoint
+    """, (from_day,))
+
+    names = [c[0] for c in cur.description]
+    rows = []
+    for values in cur:
+        row = dict(zip(names, values))
+        row["buckets"] = json.loads(row["buckets"] or "[]")
+        row["statuses"] = json.loads(row["statuses"] or "{}")
+        rows.append(row)
+    return rows
+
+
+# --------------------------------------------------
+# Screenshot upload queue
+# --------------------------------------------------
+# status : pending | uploaded | failed (attempts exhausted)
+#          | missing (file gone) | evicted (deleted by the quota manager)
+STORED_STATUSES = ("pending", "uploaded", "failed")
+
+
+def queue_uploads(files):
+    """
+    files: [(path, size, created_at)] – already known paths are left untouched.
+    Returns the number of new rows.
+    """
+    conn = get_conn()
+    now = _now_str()
+
+    with conn:
+        cur = conn.executemany("""
+            INSERT OR IGNORE INTO screenshot_uploads (path, size, status, queued_at, created_at)
+            VALUES (?, ?, 'pending', ?, ?)
+        """, [(path, size, now, created_at or now) for path, size, created_at in files])
+    return cur.rowcount
+
+
+def rename_upload(old_path, new_path):
+    """Screenshot moved inside the store (layout migration)."""
+    conn = get_conn()
+
+    with conn:
+        conn.execute("""
+            UPDATE OR IGNORE screenshot_uploads SET path = ? WHERE path = ?
+        """, (new_path, old_path))
+
+
+def get_pending_uploads(limit):
+    """Oldest pending screenshots first."""
+    return [
+        row[0] for row in get_conn().execute("""
+            SELECT path FROM screenshot_uploads
+            WHERE status = 'pending'
+            ORDER BY path
+            LIMIT ?
+        """, (limit,))
+    ]
+
+
+def record_upload(path, file_url):
+    conn = get_conn()
+
+    with conn:
+        conn.execute("""
+            UPDATE screenshot_uploads
+            SET status = 'uploaded', attempts = attempts + 1,
+                file_url = ?, last_error = NULL, uploaded_at = ?
+            WHERE path = ?
+        """, (file_url, _now_str(), path))
+
+
+def record_upload_error(path, error, max_attempts, status=None):
+    """Failed attempt; the row stays pending until max_attempts (or forced status)."""
+    conn = get_conn()
+
+    with conn:
+        conn.execute("""
+            UPDATE screenshot_uploads
+            SET attempts   = attempts + 1,
+                last_error = ?,
+                status     = COALESCE(?, CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END)
+            WHERE path = ?
+        """, (str(error)[:500], status, max_attempts, path))
+
+
+def get_upload_counts():
+    return dict(get_conn().execute("""
+        SELECT status, COUNT(*) FROM screenshot_uploads GROUP BY status
+    """).fetchall())
+
+
+# ---- Screenshot quota (size index over stored files) ----
+def get_stored_screenshot_bytes():
+    return get_conn().execute(f"""
+        SELECT COALESCE(SUM(size), 0) FROM screenshot_uploads
+        WHERE status IN ({", ".join("?" * len(STORED_STATUSES))})
+    """, STORED_STATUSES).fetchone()[0]
+
+
+def get_eviction_candidates(limit, older_than=None):
+    """
+    Stored screenshots to delete next: uploaded ones first, then the
+    rest, oldest first. older_than → only files created before it.
+    Returns [(path, size, status)].
+    """
+    sql = f"""
+        SELECT path, size, status FROM screenshot_uploads
+        WHERE status IN ({", ".join("?" * len(STORED_STATUSES))})
+    """
+    params = list(STORED_STATUSES)
+    if older_than:
+        sql += " AND created_at < ?"
+        params.append(older_than)
+    sql += " ORDER BY status = 'uploaded' DESC, created_at LIMIT ?"
+    params.append(limit)
+
+    return get_conn().execute(sql, params).fetchall()
+
+
+def mark_evicted(paths):
+    conn = get_conn()
+
+    with conn:
+        conn.executemany("""
+            UPDATE screenshot_uploads SET status = 'evicted' WHERE path = ?
+        """, [(p,) for p in paths])
+
+
+def get_screenshot_usage():
+    """{status: {"files": n, "bytes": n}}"""
+    return {
+        status: {"files": files, "bytes": size or 0}
+        for status, files, size in get_conn().execute("""
+            SELECT status, COUNT(*), SUM(size) FROM screenshot_uploads GROUP BY status
+        """)
+    }
+
+
+# --------------------------------------------------
+# Agent settings (JSON values, latest write wins)
+# --------------------------------------------------
+def save_settings(settings):
+    """settings : {key: JSON-serialisable value}"""
+    now = _now_str()
+    conn = get_conn()
+    with conn:
+        conn.executemany("""
+            INSERT INTO agent_settings (key, value, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(key)
+            DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+        """, [(key, json.dumps(value), now) for key, value in settings.items()])
+
+
+# --------------------------------------------------
+# App usage (foreground window per credited tick)
+# --------------------------------------------------
+# app_names  : each process name stored once → small ids
+# app_usage  : (day, start_min..end_min, app_id) runs; minutes of the
+#              day (0-1439), seconds = work seconds credited inside the run
+#              (sums match daily_work)
+# app_titles : seconds per (day, app, title); at most APP_TITLES_PER_DAY
+#              titles per app and day, the rest summed under OTHER_TITLE
+# Writer thread only → the id cache needs no lock.
+OTHER_TITLE = ""
+
+_app_ids = {}
+
+
+def _app_id(conn, name):
+    app_id = _app_ids.get(name)
+    if app_id is None:
+        conn.execute("INSERT OR IGNORE INTO app_names (name) VALUES (?)", (name,))
+        app_id = conn.execute("SELECT id FROM app_names WHERE name = ?", (name,)).fetchone()[0]
+        _app_ids[name] = app_id
+    return app_id
+
+
+def _add_title_seconds(conn, day, app_id, title, seconds):
+    updated = conn.execute(
+        "UPDATE app_titles SET seconds = seconds + ? WHERE day = ? AND app_id = ? AND title = ?",
+        (seconds, day, app_id, title)
+    ).rowcount
+    if updated:
+        return
+
+    known = conn.execute(
+        "SELECT COUNT(*) FROM app_titles WHERE day = ? AND app_id = ? AND title != ?",
+        (day, app_id, OTHER_TITLE)
+    ).fetchone()[0]
+    if known >= APP_TITLES_PER_DAY:
+        title = OTHER_TITLE
+
+    conn.execute("""
+        INSERT INTO app_titles (day, app_id, title, seconds)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(day, app_id, title)
+        DO UPDATE SET seconds = seconds + excluded.seconds
+    """, (day, app_id, title, seconds))
+
+
+def save_app_usage(samples):
+    """
+    Apply app samples in ONE transaction.
+    samples : iterable of (day, minute, process, title, seconds)
+    Same process in the same / next minute extends the last run,
+    whatever the window title.
+    """
+    conn = get_conn()
+
+    try:
+        _apply_app_samples(conn, samples)
+    except Exception:
+        _app_ids.clear()    # ids inserted by the rolled-back transaction
+        raise
+
+
+def _apply_app_samples(conn, samples):
+    with conn:
+        last = conn.execute("""
+            SELECT id, day, end_min, app_id
+            FROM app_usage
+            ORDER BY id DESC
+            LIMIT 1
+        """).fetchone()
+
+        for day, minute, process, title, seconds in samples:
+            app_id = _app_id(conn, process)
+
+            if last and last[1] == day and last[3] == app_id and last[2] <= minute <= last[2] + 1:
+                conn.execute(
+                    "UPDATE app_usage SET end_min = ?, seconds = seconds + ? WHERE id = ?",
+                    (minute, seconds, last[0])
+                )
+                last = (last[0], day, minute, app_id)
+            else:
+                cur = conn.execute(
+                    "INSERT INTO app_usage (day, start_min, end_min, app_id, seconds) VALUES (?, ?, ?, ?, ?)",
+                    (day, minute, minute, app_id, seconds)
+                )
+                last = (cur.lastrowid, day, minute, app_id)
+
+            if title:
+                _add_title_seconds(conn, day, app_id, title, seconds)
@@ -0,0 +1,90 @@
+import os
+import re
+import zipfile
+from datetime import date, timedelta
+
+from config import LOG_DIR, LOG_ARCHIVE_AFTER_DAYS
+
+
+# ==================================================
+# MONTHLY ACTIVITY LOG ARCHIVES (YYYY-MM.zip)
+# ==================================================
+# Day files older than LOG_ARCHIVE_AFTER_DAYS are moved into one zip
+# per month. Every day file is its own deflated member and the zip
+# central directory is the index, so reading one day inflates only
+# that member – never the whole month.
+#
+# ⚠️ workforce-dashboard/backend/main.py reads these archives too.
+DAY_FILE_RE = re.compile(r"^(\d{4}-\d{2})-\d{2}\.(jsonl|json|bin)$")
+
+
+def archive_path(month):
+    """
+    month : YYYY-MM
+    """
+    return os.path.join(LOG_DIR, f"{month}.zip")
+
+
+def read_archived(filename):
+    """
+    Returns bytes of an archived day file (e.g. 2026-01-22.jsonl)
+    or None if it is not archived.
+    """
+    match = DAY_FILE_RE.match(filename)
+    if not match:
+        return None
+
+    try:
+        with zipfile.ZipFile(archive_path(match.group(1))) as zf:
+            return zf.read(filename)
+    except (FileNotFoundError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def _add_to_archive(month, paths):
+    """
+    Append the new day files to the month archive (existing members are
+    never re-read or re-compressed). Day files are deleted by the caller
+    only after this returns, so a crash mid-append loses no data.
+    """
+    with zipfile.ZipFile(archive_path(month), "a", compression=zipfile.ZIP_DEFLATED) as zf:
+        names = set(zf.namelist())
+
+        for path in paths:
+            name = os.path.basename(path)
+            if name in names:
+                continue   # archived before a crash, original not yet deleted
+            zf.write(path, name)
+
+
+def archive_old_logs(max_age_days=LOG_ARCHIVE_AFTER_DAYS):
+    """
+    Compress day files older than max_age_days into monthly archives.
+    Returns number of day files archived.
+    """
+    cutoff = (date.today() - timedelta(days=max_age_days)).isoformat()
+    by_month = {}
+
+    for name in os.listdir(LOG_DIR):
+        match = DAY_FILE_RE.match(name)
+        if not match or name[:10] >= cutoff:
+            continue
+        by_month.setdefault(match.group(1), []).append(os.path.join(LOG_DIR, name))
+
+    archived = 0
+
+    for month, paths in sorted(by_month.items()):
+        try:
+            _add_to_archive(month, sorted(paths))
+        except Exception as e:
+            print(f"⚠️ Log archive failed ({month}):", e)
+            continue
+
+        for path in paths:
+            os.remove(path)
+        archived += len(paths)
+
+    if archived:
+        print(f"🗜 Archived {archived} activity log file(s)")
+
+    return archived
@@ -0,0 +1,255 @@
+import queue
+import threading
+import time
+
+from config import LOG_FLUSH_INTERVAL_SEC, LOG_QUEUE_MAX
+from activity_logger import take_sample, write_samples
+from local_db import save_days, save_intervals, save_app_usage, close_conn
+
+
+# ==================================================
+# QUEUE MESSAGE KINDS
+# ==================================================
+_ACTIVITY = "activity"
+_DAY = "day"
+_INTERVAL = "interval"
+_APP = "app"
+_FLUSH = "flush"
+_STOP = "stop"
+
+
+# ==================================================
+# BACKGROUND LOG WRITER (GROUP COMMIT)
+# ==================================================
+class LogWriter(threading.Thread):
+    """
+    Owns all per-tick disk writes of the agent.
+
+    The main loop only enqueues (never waits on disk); this thread
+    batches activity samples and daily_work upserts and commits them
+    once per flush interval:
+    - activity journals: one append + fsync per file
+    - daily_work: one transaction (latest row per day wins)
+    - activity_intervals: one transaction (ops applied in order)
+    - app_usage: one transaction (samples applied in order)
+    """
+
+    def __init__(self, flush_interval=LOG_FLUSH_INTERVAL_SEC, max_queue=LOG_QUEUE_MAX):
+        super().__init__(name="LogWriter", daemon=True)
+
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopped = False
+
+        # Kept across failed flushes, retried on the next one
+        self._pending_samples = []
+        self._pending_days = {}
+        self._pending_intervals = []
+        self._pending_apps = []
+
+        # ------------------------------
+        # Counters (see stats())
+        # ------------------------------
+        self._stats_lock = threading.Lock()
+        self.flushes = 0
+        self.flush_errors = 0
+        self.samples_written = 0
+        self.days_written = 0
+        self.intervals_written = 0
+        self.apps_written = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    # ------------------------------------------------
+    # PRODUCER API (called from the agent loop)
+    # ------------------------------------------------
+    def log_activity(self, state, idle_sec, input_counts=None):
+        self._put((_ACTIVITY, take_sample(state, idle_sec, input_counts=input_counts)))
+
+    def save_day(self, work_date, normal_sec, ot_sec, first_seen, last_seen):
+        self._put((_DAY, (work_date, normal_sec, ot_sec, first_seen, last_seen)))
+
+    def log_interval(self, start_ts, end_ts, state):
+        self._put((_INTERVAL, ("add", start_ts, end_ts, state)))
+
+    def relabel_interval(self, state):
+        self._put((_INTERVAL, ("relabel", state)))
+
+    def log_app(self, now, window, seconds):
+        minute = now.hour * 60 + now.minute
+        self._put((_APP, (now.strftime("%Y-%m-%d"), minute, window.process, window.title, int(round(seconds)))))
+
+    def flush(self, timeout=30):
+        """Commit everything queued so far and wait for it (day close)."""
+        return self._request(_FLUSH, timeout)
+
+    def stop(self, timeout=30):
+        """Final flush on shutdown; later writes are ignored."""
+        if self._stopped:
+            return True
+        done = self._request(_STOP, timeout)
+        self._stopped = True
+        return done
+
+    def _put(self, item):
+        if self._stopped:
+            return
+        try:
+            # Short wait only: a stalled disk must not stall accounting
+            self._queue.put(item, timeout=1)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            print("⚠️ Log writer queue full, entry dropped")
+
+    def _request(self, kind, timeout):
+        if not self.is_alive():
+            # Writer never started / already gone → write inline
+            self._commit(self._drain())
+            return True
+
+        done = threading.Event()
+        started = time.monotonic()
+        try:
+            # Full queue = stalled disk: give up after `timeout` as well
+            self._queue.put((kind, done), timeout=timeout)
+        except queue.Full:
+            print(f"⚠️ Log writer queue full, {kind} not queued")
+            return False
+        return done.wait(max(0.0, timeout - (time.monotonic() - started)))
+
+    # ------------------------------------------------
+    # WRITER THREAD
+    # ------------------------------------------------
+    def run(self):
+        while True:
+            deadline = time.monotonic() + self.flush_interval
+            batch = []
+            waiters = []
+            stop = False
+
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+                if item[0] in (_FLUSH, _STOP):
+                    waiters.append(item[1])
+                    stop = item[0] == _STOP
+                    break
+
+                batch.append(item)
+
+            self._commit(batch)
+
+            for done in waiters:
+                done.set()
+
+            if stop:
+                close_conn()
+                return
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if item[0] in (_ACTIVITY, _DAY, _INTERVAL, _APP):
+                batch.append(item)
+            else:
+                item[1].set()
+
+    def _commit(self, batch):
+        for kind, payload in batch:
+            if kind == _ACTIVITY:
+                self._pending_samples.append(payload)
+            elif kind == _INTERVAL:
+                self._pending_intervals.append(payload)
+            elif kind == _APP:
+                self._pending_apps.append(payload)
+            else:
+                self._pending_days[payload[0]] = payload
+
+        if not (self._pending_samples or self._pending_days or self._pending_intervals or self._pending_apps):
+            return
+
+        started = time.perf_counter()
+        failed = False
+
+        if self._pending_samples:
+            try:
+                write_samples(self._pending_samples, fsync=True)
+                with self._stats_lock:
+                    self.samples_written += len(self._pending_samples)
+                self._pending_samples = []
+            except Exception as e:
+                failed = True
+                print("❌ Activity log flush failed (will retry):", e)
+
+        if self._pending_days:
+            try:
+                save_days(list(self._pending_days.values()))
+                with self._stats_lock:
+                    self.days_written += len(self._pending_days)
+                self._pending_days = {}
+            except Exception as e:
+                failed = True
+                print("❌ daily_work flush failed (will retry):", e)
+
+        if self._pending_intervals:
+            try:
+                save_intervals(self._pending_intervals)
+                with self._stats_lock:
+                    self.intervals_written += len(self._pending_intervals)
+                self._pending_intervals = []
+            except Exception as e:
+                failed = True
+                print("❌ activity_intervals flush failed (will retry):", e)
+
+        if self._pending_apps:
+            try:
+                save_app_usage(self._pending_apps)
+                with self._stats_lock:
+                    self.apps_written += len(self._pending_apps)
+                self._pending_apps = []
+            except Exception as e:
+                failed = True
+                print("❌ app_usage flush failed (will retry):", e)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._stats_lock:
+            self.flushes += 1
+            if failed:
+                self.flush_errors += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    # ------------------------------------------------
+    # COUNTERS
+    # ------------------------------------------------
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "samples_written": self.samples_written,
+                "days_written": self.days_written,
+                "intervals_written": self.intervals_written,
+                "apps_written": self.apps_written,
+                "dropped": self.dropped,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "max_flush_ms": round(self.max_flush_ms, 2),
+                "avg_flush_ms": round(self._total_flush_ms / self.flushes, 2) if self.flushes else 0.0
+            }
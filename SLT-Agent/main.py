@@ -10,6 +10,8 @@ from config import STORAGE_PATH, ERP_SYNC_INTERVAL_MIN
 from step1_login import start_login_ui
 from step3_agent import SLTAgent
 from step4_erp_push import run_erp_push
+from step5_erp_upload import run_upload_queue
+from erp_client import get_client, CircuitBreaker
 
 # 🆕 STARTUP REGISTER
 from startup_register import ensure_startup_registered
@@ -43,7 +45,25 @@ def erp_sync_loop():
         except Exception as e:
             print("❌ ERP Sync error (ignored):", e)
 
-        time.sleep(ERP_SYNC_INTERVAL_MIN * 60)
+        # Low priority: only after the push, on its own request budget
+        try:
+            run_upload_queue()
+        except Exception as e:
+            print("❌ Screenshot upload error (ignored):", e)
+
+        time.sleep(next_sync_delay())
+
+
+def next_sync_delay():
+    # Circuit open → wake up for the probe, so sync resumes
+    # as soon as the ERP is reachable again
+    delay = ERP_SYNC_INTERVAL_MIN * 60
+    breaker = get_client().breaker
+
+    if breaker and breaker.state() != CircuitBreaker.CLOSED:
+        delay = min(delay, max(1, breaker.seconds_until_probe()))
+
+    return delay
 
 
 # ==================================================
@@ -0,0 +1,151 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from config import (
+    SCREENSHOT_DIR,
+    SCREENSHOT_QUOTA_MB,
+    SCREENSHOT_MAX_AGE_DAYS,
+    SCREENSHOT_EVICT_BATCH
+)
+from local_db import (
+    queue_uploads,
+    get_stored_screenshot_bytes,
+    get_eviction_candidates,
+    mark_evicted,
+    get_screenshot_usage,
+    save_settings,
+    STORED_STATUSES
+)
+from screenshot_store import IMAGE_EXTENSIONS, rel_path, record_status
+
+
+# ==================================================
+# SCREENSHOT STORAGE QUOTA
+# ==================================================
+class ScreenshotQuota:
+    """
+    Keeps SCREENSHOT_DIR under a byte quota and a maximum age.
+
+    The size index is the screenshot_uploads table (one row per stored
+    image, written when the image is saved), so enforcing never walks
+    the directory. Each enforce() call deletes at most `batch` files:
+    uploaded ones first, then the rest, oldest first.
+    """
+
+    def __init__(
+        self,
+        root=SCREENSHOT_DIR,
+        quota_bytes=SCREENSHOT_QUOTA_MB * 1024 * 1024,
+        max_age_days=SCREENSHOT_MAX_AGE_DAYS,
+        batch=SCREENSHOT_EVICT_BATCH
+    ):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.max_age_days = max_age_days
+        self.batch = batch
+
+        self._lock = threading.Lock()
+        self._total = None   # running byte count, loaded on first use
+
+    # ------------------------------------------------
+    def _total_bytes(self):
+        if self._total is None:
+            self._total = get_stored_screenshot_bytes()
+        return self._total
+
+    def reconcile(self):
+        """
+        One-time walk (startup): index images the table does not know
+        yet – older builds, or written while the DB was unavailable.
+        Also records the effective quota / max age in agent_settings.
+        """
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                rel = rel_path(full, self.root)
+                created = datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+                files.append((rel, st.st_size, created))
+
+        with self._lock:
+            added = queue_uploads(files) if files else 0
+            self._total = get_stored_screenshot_bytes()
+
+        # Read back by the dashboard (/screenshots/usage)
+        save_settings({
+            "screenshot_quota_bytes": self.quota_bytes,
+            "screenshot_max_age_days": self.max_age_days
+        })
+        return added
+
+    def register(self, rel_path, size, created_at=None):
+        """A new image was written (path relative to root)."""
+        created = (created_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            if queue_uploads([(rel_path, size, created)]):
+                self._total = self._total_bytes() + size
+
+    def enforce(self):
+        """One incremental eviction step. Returns the number of files deleted."""
+        with self._lock:
+            victims = []
+
+            if self.max_age_days:
+                cutoff = (datetime.now() - timedelta(days=self.max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+                victims = get_eviction_candidates(self.batch, older_than=cutoff)
+
+            over = self._total_bytes() - self.quota_bytes if self.quota_bytes else 0
+            if over > 0 and len(victims) < self.batch:
+                seen = {path for path, _, _ in victims}
+                for row in get_eviction_candidates(self.batch * 2):
+                    if over <= 0 or len(victims) >= self.batch:
+                        break
+                    if row[0] not in seen:
+                        victims.append(row)
+                        over -= row[1] or 0
+
+            if not victims:
+                return 0
+
+            removed = []
+            freed = 0
+            for path, size, status in victims:
+                try:
+                    os.remove(os.path.join(self.root, *path.split("/")))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    # Locked (viewer open, AV scan) → retried next step
+                    print(f"⚠️ Screenshot eviction skipped ({path}):", e)
+                    continue
+                removed.append(path)
+                freed += size or 0
+                if status != "uploaded":
+                    print(f"⚠️ Evicting screenshot not yet uploaded: {path}")
+
+            mark_evicted(removed)
+            for path in removed:
+                record_status(path, "evicted")
+            self._total = self._total_bytes() - freed
+
+        if removed:
+            print(f"🧹 Screenshot quota: {len(removed)} file(s) removed, {freed // 1024} KB freed")
+        return len(removed)
+
+    def usage(self):
+        by_status = get_screenshot_usage()
+        stored = sum(by_status.get(s, {}).get("bytes", 0) for s in STORED_STATUSES)
+        return {
+            "stored_bytes": stored,
+            "quota_bytes": self.quota_bytes,
+            "used_pct": round(100 * stored / self.quota_bytes, 1) if self.quota_bytes else None,
+            "max_age_days": self.max_age_days,
+            "by_status": by_status
+        }
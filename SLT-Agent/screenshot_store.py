@@ -0,0 +1,165 @@
+"""
+Screenshot store layout (shared with workforce-dashboard/backend/main.py):
+
+    SCREENSHOT_DIR/
+        YYYY-MM-DD/
+            YYYYMMDD_HHMMSS.webp
+            manifest.jsonl
+
+manifest.jsonl is append-only, one JSON object per line:
+- capture : {"taken_at", "file", "size", "width", "height",
+             "phash", "duplicate_of", "upload_status"}
+            duplicate_of set → no image of its own, `file` is the
+            referenced image (size / width / height omitted)
+- status  : {"file", "upload_status", "at", ...}
+            later lines win (uploaded / missing / evicted)
+
+Listing a day = reading its manifest; no directory stat / sort
+(workforce-dashboard: read_screenshot_manifest).
+"""
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+from config import SCREENSHOT_DIR, SCREENSHOT_MANIFEST_FILE
+
+IMAGE_EXTENSIONS = (".webp", ".jpg", ".jpeg", ".png")
+
+# Flat layout of older builds: SCREENSHOT_DIR/YYYYMMDD_HHMMSS.png
+FLAT_FILE_RE = re.compile(r"^(\d{4})(\d{2})(\d{2})_\d{6}\.\w+$")
+LEGACY_INDEX_FILE = "index.jsonl"
+
+_manifest_lock = threading.Lock()
+
+
+def _now_str():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ==================================================
+# PATHS
+# ==================================================
+def day_dir(day, root=SCREENSHOT_DIR):
+    """day: date / datetime / 'YYYY-MM-DD'."""
+    name = day if isinstance(day, str) else day.strftime("%Y-%m-%d")
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def image_path(taken_at, ext, root=SCREENSHOT_DIR):
+    return os.path.join(day_dir(taken_at, root), taken_at.strftime("%Y%m%d_%H%M%S") + ext)
+
+
+def rel_path(path, root=SCREENSHOT_DIR):
+    """'YYYY-MM-DD/name.webp' – key used by screenshot_uploads."""
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+# ==================================================
+# MANIFEST (APPEND-ONLY)
+# ==================================================
+def append_manifest(day, entries, root=SCREENSHOT_DIR):
+    lines = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+    with _manifest_lock:
+        with open(os.path.join(day_dir(day, root), SCREENSHOT_MANIFEST_FILE), "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def record_capture(taken_at, file, phash, size=None, width=None, height=None, duplicate_of=None):
+    entry = {
+        "taken_at": taken_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "file": file,
+        "phash": phash,
+        "duplicate_of": duplicate_of
+    }
+    if not duplicate_of:
+        entry.update(size=size, width=width, height=height, upload_status="pending")
+    append_manifest(taken_at, [entry])
+
+
+def record_status(rel, status, **extra):
+    """rel: 'YYYY-MM-DD/name' (as stored in screenshot_uploads)."""
+    day, _, file = rel.rpartition("/")
+    if not day:
+        return
+    append_manifest(day, [dict({"file": file, "upload_status": status, "at": _now_str()}, **extra)])
+
+
+# ==================================================
+# ONE-TIME MIGRATION (FLAT → PER-DAY)
+# ==================================================
+def migrate_flat_layout(root=SCREENSHOT_DIR, rename_upload=None):
+    """
+    Moves SCREENSHOT_DIR/YYYYMMDD_HHMMSS.* into YYYY-MM-DD/ and writes
+    their manifest entries (the legacy root index.jsonl supplies hashes
+    and duplicate references). rename_upload(old_rel, new_rel) keeps
+    screenshot_uploads rows pointing at the moved files.
+    Returns the number of files moved.
+    """
+    legacy = {}
+    legacy_path = os.path.join(root, LEGACY_INDEX_FILE)
+    if os.path.exists(legacy_path):
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    legacy.setdefault(entry["taken_at"][:10], []).append(entry)
+                except (ValueError, KeyError):
+                    continue
+
+    moved = 0
+    by_day = {}
+    for name in sorted(os.listdir(root)):
+        m = FLAT_FILE_RE.match(name)
+        if not m or not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+
+        day = f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
+        src = os.path.join(root, name)
+        dst = os.path.join(day_dir(day, root), name)
+        size = os.path.getsize(src)
+        os.replace(src, dst)
+        moved += 1
+
+        if rename_upload:
+            rename_upload(name, f"{day}/{name}")
+        by_day.setdefault(day, {})[name] = size
+
+    for day in sorted(set(by_day) | set(legacy)):
+        files = by_day.get(day, {})
+        entries = []
+        seen = set()
+
+        for entry in legacy.get(day, []):
+            if entry.get("file") not in files:
+                continue
+            seen.add(entry["file"])
+            if not entry.get("duplicate_of"):
+                entry = dict(entry, size=files[entry["file"]], upload_status="pending")
+            entries.append(entry)
+
+        for name, size in files.items():
+            if name not in seen:
+                stamp = datetime.strptime(name[:15], "%Y%m%d_%H%M%S")
+                entries.append({
+                    "taken_at": stamp.strftime("%Y-%m-%d %H:%M:%S"),
+                    "file": name,
+                    "phash": None,
+                    "duplicate_of": None,
+                    "size": size,
+                    "upload_status": "pending"
+                })
+
+        if entries:
+            entries.sort(key=lambda e: e["taken_at"])
+            append_manifest(day, entries, root)
+
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+    if moved:
+        print(f"📁 Screenshots moved to per-day folders: {moved}")
+    return moved
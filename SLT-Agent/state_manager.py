@@ -1,6 +1,8 @@
 from datetime import date
 
 
+_UNSET = object()
+
 class DailyState:
     """
     Holds per-day working state.
@@ -9,11 +11,31 @@ class DailyState:
     - Idle/lunch/break usage
     - First activity (IN)
     - Last activity (OUT)
+
+    Every change to a persisted field bumps `version`, so the
+    persistence layer can skip writes when nothing changed.
     """
 
+    # Fields mirrored into daily_work / activity log
+    TRACKED_FIELDS = (
+        "date",
+        "normal_seconds",
+        "ot_seconds",
+        "lunch_used",
+        "breaks_used",
+        "first_seen",
+        "last_seen"
+    )
+
     def __init__(self):
+        object.__setattr__(self, "version", 0)
         self.reset()
 
+    def __setattr__(self, name, value):
+        if name in self.TRACKED_FIELDS and getattr(self, name, _UNSET) != value:
+            object.__setattr__(self, "version", self.version + 1)
+        object.__setattr__(self, name, value)
+
     def reset(self):
         # ------------------------------
         # Day boundary (STRICT)
@@ -42,6 +64,12 @@ class DailyState:
         # ⚠️ Updated ONLY when idle < threshold
         self.last_seen = None
 
+        # ------------------------------
+        # Dirty tracking
+        # ------------------------------
+        # Version last written to disk (None → never saved)
+        self.saved_version = None
+
     # ------------------------------------------------
     # Helpers (safe, optional but useful)
     # ------------------------------------------------
@@ -56,3 +84,13 @@ class DailyState:
     def total_work_seconds(self):
         """Total payable work time"""
         return self.normal_seconds + self.ot_seconds
+
+    # ------------------------------------------------
+    # Dirty tracking
+    # ------------------------------------------------
+    def is_dirty(self):
+        """Returns True if state changed since the last mark_saved()"""
+        return self.saved_version != self.version
+
+    def mark_saved(self):
+        self.saved_version = self.version
@@ -1,9 +1,9 @@
 import json
 import uuid
 import platform
-import requests
 from datetime import datetime
-from config import ERP_BASE_URL, STORAGE_PATH
+from config import STORAGE_PATH
+from erp_client import ErpClient, get_client
 
 # 🔐 ADMIN API KEY (ONLY ON SERVER / BUILD SYSTEM)
 ADMIN_API_KEY = "YOUR_ADMIN_API_KEY"
@@ -11,7 +11,9 @@ ADMIN_API_SECRET = "YOUR_ADMIN_API_SECRET"
 
 def sync_employee(cookies, user_agent=None):
     try:
-        session = requests.Session()
+        # Cookie-authenticated client (no API key), pooled keep-alive session
+        client = ErpClient(headers=None)
+        session = client.session
         if user_agent:
             print(f"🕵️ Using User-Agent: {user_agent[:30]}...")
             session.headers.update({"User-Agent": user_agent})
@@ -55,8 +57,9 @@ def sync_employee(cookies, user_agent=None):
         # STEP 1: Get CSRF Token
         # ----------------------------- 
         print("🔐 Fetching CSRF token...")
-        csrf_response = session.get(
-            f"{ERP_BASE_URL}/api/method/frappe.auth.get_logged_user",
+        csrf_response = client.request(
+            "GET",
+            "/api/method/frappe.auth.get_logged_user",
             headers={"Accept": "application/json"}
         )
         
@@ -92,14 +95,14 @@ def sync_employee(cookies, user_agent=None):
         # STEP 3: Get logged-in user
         # ----------------------------- 
         print("👤 Getting logged-in user...")
-        user_response = session.get(f"{ERP_BASE_URL}/api/method/frappe.auth.get_logged_user")
+        user_response = client.request("GET", "/api/method/frappe.auth.get_logged_user")
         
         print(f"📡 Status: {user_response.status_code}")
         
         if user_response.status_code == 403:
             print("❌ 403 Forbidden - Trying alternative method...")
             # Try using /api/method/frappe.handler.printview instead
-            user_response = session.get(f"{ERP_BASE_URL}/api/method/frappe.sessions.get_current_user")
+            user_response = client.request("GET", "/api/method/frappe.sessions.get_current_user")
         
         if user_response.status_code != 200:
             print(f"❌ Failed to get user. Status: {user_response.status_code}")
@@ -117,7 +120,7 @@ def sync_employee(cookies, user_agent=None):
         # ----------------------------- 
         # Find Employee
         # ----------------------------- 
-        employee = find_employee(session, email)
+        employee = find_employee(client, email)
         
         # ----------------------------- 
         # AUTO CREATE EMPLOYEE (IF MISSING)
@@ -164,7 +167,7 @@ def sync_employee(cookies, user_agent=None):
 # ==================================================
 # HELPERS
 # ==================================================
-def find_employee(session, email):
+def find_employee(client, email):
     filters = [
         ["user_id", "=", email],
         ["personal_email", "=", email],
@@ -173,8 +176,9 @@ def find_employee(session, email):
     
     for f in filters:
         try:
-            r = session.get(
-                f"{ERP_BASE_URL}/api/resource/Employee",
+            r = client.request(
+                "GET",
+                "/api/resource/Employee",
                 params={
                     "filters": json.dumps([f]),
                     "fields": json.dumps(["name", "employee_name", "department", "designation"])
@@ -209,8 +213,9 @@ def create_employee_note(email):
     }
     
     try:
-        r = requests.post(
-            f"{ERP_BASE_URL}/api/resource/Employee",
+        r = get_client().request(
+            "POST",
+            "/api/resource/Employee",
             headers=headers,
             json=payload
         )
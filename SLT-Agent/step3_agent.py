@@ -1,13 +1,16 @@
 import time
-from datetime import datetime, date
+import atexit
+from datetime import datetime, date, timedelta
 
 from activity_tracker import ActivityTracker
 from state_manager import DailyState
 from config import *
 
-from local_db import init_db, save_day
-from step5_screenshot import take_screenshot
-from activity_logger import log_activity
+from local_db import init_db
+from log_writer import LogWriter
+from log_archive import archive_old_logs
+from step5_screenshot import ScreenshotWorker
+from tick_scheduler import TickScheduler
 from step4_erp_push import run_erp_push   # CLOSED DAY ONLY
 
 
@@ -34,9 +37,28 @@ class SLTAgent:
 
         init_db()
 
+        # All per-tick disk writes go through the background writer
+        self.writer = LogWriter()
+        self.writer.start()
+
+        # Screen grab + encode happen off the loop as well
+        self.screenshots = ScreenshotWorker()
+        self.screenshots.start()
+        atexit.register(self.stop)
+
+        # Loop timing: monotonic deadlines, real elapsed time credited
+        self.ticks = TickScheduler()
+        self.work_carry = 0.0       # sub-second remainder of credited ticks
+
         self.idle_seconds = 0
         self.last_screenshot_min = None
         self.last_idle_bucket = None
+        self.last_checkpoint = time.monotonic()
+
+        # Timeline (activity_intervals)
+        self.last_tick = None
+        self.last_kind = None       # state of the previous tick's span
+        self.idle_kind = "idle"     # idle → break / lunch once classified
 
     # ------------------------------------------------
     # IDLE HANDLING (LUNCH / BREAK AUTO-DETECT)
@@ -50,17 +72,59 @@ class SLTAgent:
 
         if idle_sec >= LUNCH_SEC and not self.state.lunch_used:
             self.state.lunch_used = True
+            self.set_idle_kind("lunch")
             print("🍽 Lunch detected")
             return
 
         if idle_sec >= BREAK_SEC and self.state.breaks_used < MAX_BREAKS_PER_DAY:
             self.state.breaks_used += 1
+            self.set_idle_kind("break")
             print(f"☕ Break detected ({self.state.breaks_used})")
             return
 
+    def set_idle_kind(self, kind):
+        # The whole current idle run becomes the break / lunch
+        self.idle_kind = kind
+        self.writer.relabel_interval(kind)
+
+    # ------------------------------------------------
+    # TIMELINE (merged into activity_intervals)
+    # ------------------------------------------------
+    def record_interval(self, now, idle_sec, credited, elapsed):
+        if credited:
+            kind = "work"
+        elif idle_sec >= IDLE_LIMIT_SEC:
+            kind = self.idle_kind
+        else:
+            kind = "uncounted"   # active, but lunch taken / daily caps reached
+
+        self.last_kind = kind
+        self.log_span(now - timedelta(seconds=elapsed), now, kind)
+
+    def log_span(self, start, now, kind):
+        if self.last_tick and self.last_tick < now and abs((start - self.last_tick).total_seconds()) < self.ticks.tick_sec:
+            start = self.last_tick       # contiguous with previous tick (wall vs monotonic skew)
+        if start.date() != now.date():
+            start = datetime.combine(now.date(), datetime.min.time())
+
+        self.last_tick = now
+        self.writer.log_interval(
+            start.strftime("%Y-%m-%d %H:%M:%S"),
+            now.strftime("%Y-%m-%d %H:%M:%S"),
+            kind
+        )
+
     # ------------------------------------------------
     # ADD WORK (NORMAL + OT)
     # ------------------------------------------------
+    def credit_work(self, elapsed):
+        # Whole seconds only (integer totals); the remainder carries over
+        self.work_carry += elapsed
+        sec = int(self.work_carry)
+        self.work_carry -= sec
+        if sec:
+            self.add_work(sec)
+
     def add_work(self, sec):
         if self.state.normal_seconds < NORMAL_LIMIT_SEC:
             used = min(sec, NORMAL_LIMIT_SEC - self.state.normal_seconds)
@@ -78,22 +142,68 @@ class SLTAgent:
     def close_day(self):
         print("🌙 Day closed → save local + ERP sync")
 
-        save_day(
-            str(self.state.date),
-            self.state.normal_seconds,
-            self.state.ot_seconds,
-            self.state.first_seen,
-            self.state.last_seen
-        )
+        self.save_state(force=True)
+
+        # ERP push reads daily_work → make sure the day is committed
+        self.writer.flush()
 
         run_erp_push()
 
+        try:
+            archive_old_logs()
+        except Exception as e:
+            print("⚠️ Log archiving skipped:", e)
+
         self.state.reset()
         self.tracker.reset()
 
         self.idle_seconds = 0
+        self.work_carry = 0.0
         self.last_screenshot_min = None
         self.last_idle_bucket = None
+        self.last_kind = None
+        self.idle_kind = "idle"
+
+    # ------------------------------------------------
+    def save_state(self, force=False):
+        # Skip no-op upserts (idle, lunch, caps) – SSD wear / battery
+        checkpoint_due = time.monotonic() - self.last_checkpoint >= SAVE_CHECKPOINT_MIN * 60
+        if not (force or checkpoint_due or self.state.is_dirty()):
+            return
+
+        self.writer.save_day(
+            str(self.state.date),
+            self.state.normal_seconds,
+            self.state.ot_seconds,
+            self.state.first_seen,
+            self.state.last_seen
+        )
+        self.state.mark_saved()
+
+        if force or checkpoint_due:
+            self.last_checkpoint = time.monotonic()
+
+    # ------------------------------------------------
+    # SHUTDOWN (flush queued writes)
+    # ------------------------------------------------
+    def stop(self):
+        self.save_state(force=True)
+        self.writer.stop()
+        print("💾 Log writer flushed:", self.writer.stats())
+        self.screenshots.stop()
+        print("📸 Screenshot worker stopped:", self.screenshots.stats())
+        print("⏱ Agent ticks:", self.ticks.stats())
+
+    # ------------------------------------------------
+    # APP USAGE (ONLY CREDITED TIME → MATCHES daily_work)
+    # ------------------------------------------------
+    def handle_app(self, now, credited):
+        if credited <= 0:
+            return
+
+        window = self.tracker.foreground_window()
+        if window:
+            self.writer.log_app(now, window, credited)
 
     # ------------------------------------------------
     # SCREENSHOT (ONLY WHEN ACTIVE)
@@ -111,64 +221,94 @@ class SLTAgent:
         if now.minute % SCREENSHOT_INTERVAL_MIN != 0:
             return
 
-        if self.last_screenshot_min == now.minute:
+        # Several ticks per minute (sub-minute ticks) → one screenshot
+        minute = now.replace(second=0, microsecond=0)
+        if self.last_screenshot_min == minute:
             return
 
-        self.last_screenshot_min = now.minute
-        take_screenshot()
+        self.last_screenshot_min = minute
+        self.screenshots.capture(now)
 
     # ------------------------------------------------
-    # MAIN LOOP
+    # SUSPEND / RESUME (SLEEP, HIBERNATE, HUNG LOOP)
     # ------------------------------------------------
-    def run(self):
-        print("🚀 SLT Agent running in background")
-        self.tracker.start()   # ONLY ONCE
-
-        while True:
-            try:
-                now = datetime.now()
-
-                # ---- DAY CHANGE ----
-                if self.day_changed():
-                    self.close_day()
+    def handle_suspend(self, now, tick):
+        print(f"💤 System suspended ~{int(tick.gap // 60)} min → not counted")
+        asleep_from = now - timedelta(seconds=tick.gap)
 
-                idle_sec = (now - self.tracker.last_input_time).total_seconds()
+        # Awake part of the tick (loop body) continues the previous state
+        if tick.elapsed and self.last_kind:
+            if self.last_kind == "work":
+                self.credit_work(tick.elapsed)
+            self.log_span(asleep_from - timedelta(seconds=tick.elapsed), asleep_from, self.last_kind)
 
-                # ---- IDLE TRACK ----
-                if idle_sec >= 60:
-                    self.idle_seconds += 60
-                else:
-                    self.idle_seconds = 0
+        # The gap is neither work nor idle: the idle run / break
+        # detection continue from where they were
+        self.log_span(asleep_from, now, "suspended")
 
-                    if not self.state.first_seen:
-                        self.state.first_seen = now
-                    self.state.last_seen = now
-                    self.last_idle_bucket = None
+        # Input counted just before the suspend → dropped with the tick
+        self.tracker.take_counts()
+        self.save_state()
 
-                # ---- IDLE >= 20 MIN ----
-                if self.idle_seconds >= IDLE_LIMIT_SEC:
-                    self.handle_idle(self.idle_seconds)
-
-                # ---- COUNT WORK ONLY IF NOT IDLE ----
-                if idle_sec < IDLE_LIMIT_SEC and not self.state.lunch_used:
-                    self.add_work(60)
+    # ------------------------------------------------
+    # ONE TICK
+    # ------------------------------------------------
+    def on_tick(self, now, tick):
+        # ---- DAY CHANGE ----
+        if self.day_changed():
+            self.close_day()
 
-                self.handle_screenshot(now, idle_sec)
-                log_activity(self.state, idle_sec)
+        if tick.suspended:
+            self.handle_suspend(now, tick)
+            return
 
-                save_day(
-                    str(self.state.date),
-                    self.state.normal_seconds,
-                    self.state.ot_seconds,
-                    self.state.first_seen,
-                    self.state.last_seen
-                )
+        elapsed = tick.elapsed
+        idle_sec = self.tracker.idle_seconds()
+
+        # ---- IDLE TRACK (no input during the whole tick) ----
+        if idle_sec >= min(60, self.ticks.tick_sec):
+            self.idle_seconds += elapsed
+        else:
+            self.idle_seconds = 0
+
+            if not self.state.first_seen:
+                self.state.first_seen = now
+            self.state.last_seen = now
+            self.last_idle_bucket = None
+            self.idle_kind = "idle"
+
+        # ---- IDLE >= 20 MIN ----
+        if self.idle_seconds >= IDLE_LIMIT_SEC:
+            self.handle_idle(self.idle_seconds)
+
+        # ---- COUNT WORK ONLY IF NOT IDLE ----
+        worked_before = self.state.total_work_seconds()
+        if idle_sec < IDLE_LIMIT_SEC and not self.state.lunch_used:
+            self.credit_work(elapsed)
+
+        credited = self.state.total_work_seconds() - worked_before
+        self.record_interval(now, idle_sec, credited > 0, elapsed)
+        self.handle_app(now, credited)
+        self.handle_screenshot(now, idle_sec)
+        self.writer.log_activity(self.state, idle_sec, self.tracker.take_counts())
+        self.save_state()
 
-                time.sleep(60)
+    # ------------------------------------------------
+    # MAIN LOOP
+    # ------------------------------------------------
+    def run(self):
+        print("🚀 SLT Agent running in background")
+        self.tracker.start()   # ONLY ONCE
+        self.ticks.start()
 
+        while True:
+            # A failed tick needs no back-off of its own: the next one
+            # waits for its deadline and credits the time lost here
+            tick = self.ticks.wait()
+            try:
+                self.on_tick(datetime.now(), tick)
             except Exception as e:
                 print("❌ Agent error:", e)
-                time.sleep(10)
 
 
 # ==================================================
@@ -1,9 +1,24 @@
 import json
-import sqlite3
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
 
-from config import DB_PATH, STORAGE_PATH
-from erp_client import erp_get, erp_post, erp_put
+from config import STORAGE_PATH, ERP_PUSH_WORKERS
+from erp_client import erp_get, erp_post, erp_put, get_client
+from erp_metrics import erp_stage, metrics
+from local_db import (
+    get_outbox,
+    record_push,
+    record_push_error,
+    get_days_to_push,
+    record_day_push,
+    set_doc_name,
+    clear_doc_name,
+    get_conn,
+    close_conn
+)
 
 
 # ==================================================
@@ -21,46 +36,162 @@ def safe_dt(dt):
     return dt if isinstance(dt, str) else dt.strftime("%Y-%m-%d %H:%M:%S")
 
 
+def payload_hash(payload):
+    """Stable hash of an ERP payload (outbox idempotency key)."""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def doc_name(res):
+    """ERP document name from a POST/PUT response (None if absent)."""
+    data = res.get("data") if isinstance(res, dict) else None
+    return data.get("name") if isinstance(data, dict) else None
+
+
+def cached_name(outbox, doc_type):
+    """ERP document name remembered from an earlier push (or None)."""
+    row = outbox.get(doc_type)
+    return row["erp_name"] if row else None
+
+
+def is_not_found(e):
+    return getattr(getattr(e, "response", None), "status_code", None) == 404
+
+
 # ==================================================
-# ERP LOOKUPS
+# OUTBOX-AWARE PUSH (ONE ERP DOCUMENT)
 # ==================================================
 
-def get_checkin(employee, log_type, work_date):
-    res = erp_get(
-        "/api/resource/Employee Checkin",
-        params={
-            "filters": json.dumps([
-                ["employee", "=", employee],
-                ["log_type", "=", log_type],
-                ["time", ">=", f"{work_date} 00:00:00"],
-                ["time", "<=", f"{work_date} 23:59:59"]
-            ]),
-            "order_by": "time desc",
-            "limit": 1
-        }
-    )
-    return res["data"][0] if res and res.get("data") else None
-
-
-def get_timesheet(employee, work_date):
-    res = erp_get(
-        "/api/resource/Timesheet",
-        params={
-            "filters": json.dumps([
-                ["employee", "=", employee],
-                ["start_date", "=", work_date]
-            ]),
-            "limit": 1
+def push_doc(work_date, doc_type, payload, outbox, send):
+    """
+    send() performs the ERP calls and returns the document name.
+    Skipped when the same payload was already pushed successfully.
+    Returns True if the ERP was contacted.
+    """
+    h = payload_hash(payload)
+    row = outbox.get(doc_type)
+
+    if row and row["status"] == "synced" and row["payload_hash"] == h:
+        return False
+
+    try:
+        name = send()
+    except Exception as e:
+        record_push_error(work_date, doc_type, h, e)
+        raise
+
+    record_push(work_date, doc_type, h, name)
+    return True
+
+
+# ==================================================
+# BULK ERP LOOKUPS (WHOLE DATE RANGE, PAGINATED)
+# ==================================================
+
+ERP_PAGE_SIZE = 500
+
+
+def erp_get_all(endpoint, filters, fields, order_by=None):
+    """All rows of a list query, fetched ERP_PAGE_SIZE at a time."""
+    rows = []
+    start = 0
+
+    while True:
+        params = {
+            "filters": json.dumps(filters),
+            "fields": json.dumps(fields),
+            "limit_start": start,
+            "limit_page_length": ERP_PAGE_SIZE
         }
-    )
-    return res["data"][0] if res and res.get("data") else None
+        if order_by:
+            params["order_by"] = order_by
+
+        page = (erp_get(endpoint, params=params) or {}).get("data") or []
+        rows.extend(page)
+
+        if len(page) < ERP_PAGE_SIZE:
+            return rows
+        start += ERP_PAGE_SIZE
+
+
+class ErpIndex:
+    """
+    Check-ins + timesheets of one employee for a date range,
+    indexed by (date, log_type) / date.
+
+    Loaded lazily on first lookup: a cycle where the outbox skips
+    every document never touches the ERP. Shared by push workers.
+    """
+
+    def __init__(self, employee, from_date, to_date):
+        self.employee = employee
+        self.from_date = from_date
+        self.to_date = to_date
+        self._checkins = None
+        self._timesheets = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._timesheets is not None:
+            return
+        with self._lock:
+            if self._timesheets is None:
+                self._load()
+
+    def _load(self):
+        with erp_stage("lookup"):
+            self._load_rows()
+
+    def _load_rows(self):
+        checkins = erp_get_all(
+            "/api/resource/Employee Checkin",
+            filters=[
+                ["employee", "=", self.employee],
+                ["time", ">=", f"{self.from_date} 00:00:00"],
+                ["time", "<=", f"{self.to_date} 23:59:59"]
+            ],
+            fields=["name", "log_type", "time"],
+            order_by="time desc"
+        )
+
+        # Latest check-in per (date, log_type)
+        by_key = {}
+        for row in checkins:
+            key = (str(row["time"])[:10], row.get("log_type"))
+            by_key.setdefault(key, row)
+
+        timesheets = erp_get_all(
+            "/api/resource/Timesheet",
+            filters=[
+                ["employee", "=", self.employee],
+                ["start_date", ">=", self.from_date],
+                ["start_date", "<=", self.to_date]
+            ],
+            fields=["name", "start_date"]
+        )
+
+        by_date = {}
+        for row in timesheets:
+            by_date.setdefault(str(row["start_date"])[:10], row)
+
+        # Published last: _timesheets doubles as the "loaded" flag
+        self._checkins = by_key
+        self._timesheets = by_date
+
+    def checkin(self, work_date, log_type):
+        self._ensure_loaded()
+        return self._checkins.get((work_date, log_type))
+
+    def timesheet(self, work_date):
+        self._ensure_loaded()
+        return self._timesheets.get(work_date)
 
 
 # ==================================================
 # CHECKIN / CHECKOUT (SMART UPSERT)
 # ==================================================
 
-def sync_checkins(employee, work_date, first_seen, last_seen):
+def sync_checkins(employee, work_date, first_seen, last_seen, outbox=None, index=None):
     if not first_seen or not last_seen:
         print(f"⚠️ Checkin skipped ({work_date}) – missing time")
         return
@@ -69,47 +200,75 @@ def sync_checkins(employee, work_date, first_seen, last_seen):
 
     first_seen = safe_dt(first_seen)
     last_seen = safe_dt(last_seen)
+    outbox = get_outbox(work_date) if outbox is None else outbox
+    index = index or ErpIndex(employee, work_date, work_date)
 
     # -------- IN (CREATE ONCE) --------
-    in_row = get_checkin(employee, "IN", work_date)
-    if not in_row:
-        erp_post("/api/resource/Employee Checkin", {
+    def send_in():
+        name = cached_name(outbox, "IN")
+        if name:
+            return name
+
+        in_row = index.checkin(work_date, "IN")
+        if in_row:
+            return in_row.get("name")
+        res = erp_post("/api/resource/Employee Checkin", {
             "employee": employee,
             "log_type": "IN",
             "time": first_seen
         })
         print("✔ IN created:", first_seen)
+        return doc_name(res)
+
+    push_doc(work_date, "IN", {"employee": employee, "log_type": "IN", "time": first_seen}, outbox, send_in)
 
     # -------- OUT (ALWAYS UPDATE) --------
-    out_row = get_checkin(employee, "OUT", work_date)
-    if not out_row:
-        erp_post("/api/resource/Employee Checkin", {
-            "employee": employee,
-            "log_type": "OUT",
-            "time": last_seen
-        })
-        print("✔ OUT created:", last_seen)
-    else:
+    def send_out():
+        name = cached_name(outbox, "OUT")
+        if name:
+            try:
+                erp_put(f"/api/resource/Employee Checkin/{name}", {"time": last_seen})
+                print("🔄 OUT updated:", last_seen)
+                return name
+            except Exception as e:
+                if not is_not_found(e):
+                    raise
+                # Deleted on the ERP side → forget and rediscover
+                clear_doc_name(work_date, "OUT")
+
+        out_row = index.checkin(work_date, "OUT")
+        if not out_row:
+            res = erp_post("/api/resource/Employee Checkin", {
+                "employee": employee,
+                "log_type": "OUT",
+                "time": last_seen
+            })
+            print("✔ OUT created:", last_seen)
+            return doc_name(res)
+
         erp_put(
             f"/api/resource/Employee Checkin/{out_row['name']}",
             {"time": last_seen}
         )
         print("🔄 OUT updated:", last_seen)
+        return out_row["name"]
+
+    push_doc(work_date, "OUT", {"employee": employee, "log_type": "OUT", "time": last_seen}, outbox, send_out)
 
 
 # ==================================================
 # TIMESHEET (HUBSTAFF-STRICT, ERP-SAFE)
 # ==================================================
 
-def sync_timesheet(employee, work_date, first_seen, last_seen, normal_sec, ot_sec):
+def sync_timesheet(employee, work_date, first_seen, last_seen, normal_sec, ot_sec, outbox=None, index=None):
     if not first_seen or not last_seen:
         print(f"⚠️ Timesheet skipped ({work_date}) – missing time")
         return
 
     total_hours = round((normal_sec + ot_sec) / 3600, 2)
     first_seen = safe_dt(first_seen)
-
-    ts = get_timesheet(employee, work_date)
+    outbox = get_outbox(work_date) if outbox is None else outbox
+    index = index or ErpIndex(employee, work_date, work_date)
 
     # ⚠️ IMPORTANT:
     # We intentionally DO NOT send to_time
@@ -124,63 +283,191 @@ def sync_timesheet(employee, work_date, first_seen, last_seen, normal_sec, ot_se
         }]
     }
 
-    if not ts:
-        erp_post("/api/resource/Timesheet", payload)
-        print(f"✔ Timesheet created ({total_hours} hrs)")
-    else:
+    def send():
+        name = cached_name(outbox, "Timesheet")
+        if name:
+            try:
+                erp_put(f"/api/resource/Timesheet/{name}", payload)
+                print(f"🔄 Timesheet updated ({total_hours} hrs)")
+                return name
+            except Exception as e:
+                if not is_not_found(e):
+                    raise
+                clear_doc_name(work_date, "Timesheet")
+
+        ts = index.timesheet(work_date)
+
+        if not ts:
+            res = erp_post("/api/resource/Timesheet", payload)
+            print(f"✔ Timesheet created ({total_hours} hrs)")
+            return doc_name(res)
+
         # NOTE: overwriting time_logs intentionally (daily aggregate model)
         erp_put(f"/api/resource/Timesheet/{ts['name']}", payload)
         print(f"🔄 Timesheet updated ({total_hours} hrs)")
+        return ts["name"]
+
+    push_doc(work_date, "Timesheet", payload, outbox, send)
 
 
 # ==================================================
 # MAIN SYNC ENGINE (🔥 CLOSED DAYS ONLY)
 # ==================================================
 
-def run_erp_push():
+def push_day(employee, row, index):
+    """
+    Push one closed day. Check-ins then timesheet, strictly in order.
+    Returns True on success.
+    """
+    work_date, normal_sec, ot_sec, first_seen, last_seen, fingerprint = row
+
+    try:
+        outbox = get_outbox(work_date)
+        with erp_stage("checkin"):
+            sync_checkins(employee, work_date, first_seen, last_seen, outbox, index)
+        with erp_stage("timesheet"):
+            sync_timesheet(
+                employee,
+                work_date,
+                first_seen,
+                last_seen,
+                normal_sec,
+                ot_sec,
+                outbox,
+                index
+            )
+        record_day_push(work_date, fingerprint)
+        return True
+    except Exception as e:
+        record_day_push(work_date, fingerprint, error=e)
+        print("⚠️ ERP sync failed for", work_date, ":", e)
+        return False
+
+
+# One push at a time: the sync thread and the agent's day close both
+# call run_erp_push, and two runs could POST the same pending day twice
+_push_lock = threading.Lock()
+
+
+def run_erp_push(workers=ERP_PUSH_WORKERS):
+    """
+    Different days are pushed in parallel (bounded by `workers`);
+    the shared client's token bucket keeps us inside the ERP budget.
+    Returns per-cycle stats; a call made while another push is running
+    returns at once (the running push, or the next cycle, covers it).
+    """
+    if not _push_lock.acquire(blocking=False):
+        print("⏭ ERP push already running – skipped")
+        return {"skipped": True, "busy": True, "days": 0, "pushed": 0, "failed": 0,
+                "requests": 0, "seconds": 0.0, "days_per_sec": 0.0}
+
+    try:
+        return _run_erp_push(workers)
+    finally:
+        _push_lock.release()
+        # Per-endpoint call stats of this cycle → local.db
+        metrics.flush()
+
+
+def _run_erp_push(workers):
     print("=" * 60)
     print(" ERP AUTO SYNC STARTED ", datetime.now())
     print("=" * 60)
 
+    started = time.perf_counter()
+    client = get_client()
+    requests_before = client.request_count
+
+    # ERP offline → skip the whole cycle without walking any day
+    if not client.is_available():
+        wait = client.breaker.seconds_until_probe() if client.breaker else 0
+        print(f"⏸ ERP unreachable – cycle skipped (next probe in {wait:.0f}s)")
+        return {"skipped": True, "days": 0, "pushed": 0, "failed": 0,
+                "requests": client.request_count - requests_before,
+                "seconds": round(time.perf_counter() - started, 3), "days_per_sec": 0.0}
+
     employee = get_employee()
     today = date.today().isoformat()
 
-    db = sqlite3.connect(DB_PATH)
-    rows = db.execute("""
-        SELECT
-            work_date,
-            normal_seconds,
-            ot_seconds,
-            first_seen,
-            last_seen
-        FROM daily_work
-        WHERE first_seen IS NOT NULL
-          AND last_seen IS NOT NULL
-          AND work_date < ?
-    """, (today,)).fetchall()
-    db.close()
-
-    print(f"📊 Closed days found: {len(rows)}")
-
-    for work_date, normal_sec, ot_sec, first_seen, last_seen in rows:
+    # Only days that changed since their last successful push (or failed)
+    rows = get_days_to_push(today)
+
+    print(f"📊 Closed days to push: {len(rows)}")
+
+    # One bulk lookup for the whole pending range (instead of 3 GETs per day)
+    index = ErpIndex(employee, rows[0][0], rows[-1][0]) if rows else None
+
+    def push_in_worker(row):
         try:
-            sync_checkins(employee, work_date, first_seen, last_seen)
-            sync_timesheet(
-                employee,
-                work_date,
-                first_seen,
-                last_seen,
-                normal_sec,
-                ot_sec
-            )
-        except Exception as e:
-            print("⚠️ ERP sync failed for", work_date, ":", e)
+            return push_day(employee, row, index)
+        finally:
+            # Pool threads end with the cycle → release their SQLite connection
+            close_conn()
+
+    if workers > 1 and len(rows) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(rows)), thread_name_prefix="ErpPush") as pool:
+            results = list(pool.map(push_in_worker, rows))
+    else:
+        results = [push_day(employee, row, index) for row in rows]
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "skipped": False,
+        "days": len(rows),
+        "pushed": sum(results),
+        "failed": len(results) - sum(results),
+        "requests": client.request_count - requests_before,
+        "seconds": round(elapsed, 3),
+        "days_per_sec": round(len(rows) / elapsed, 2) if elapsed > 0 else 0.0
+    }
 
     print("=" * 60)
-    print(" ERP AUTO SYNC COMPLETED ")
+    print(" ERP AUTO SYNC COMPLETED ", stats)
     print("=" * 60)
 
+    return stats
+
+
+# ==================================================
+# RECONCILE (REFRESH CACHED ERP NAMES)
+# ==================================================
+
+def reconcile_doc_names(from_date, to_date):
+    """
+    Re-read ERP check-ins/timesheets for a date range and overwrite the
+    local name cache (clears names of documents that no longer exist).
+    """
+    employee = get_employee()
+    index = ErpIndex(employee, from_date, to_date)
+
+    days = [
+        row[0] for row in get_conn().execute(
+            "SELECT work_date FROM daily_work WHERE work_date BETWEEN ? AND ?",
+            (from_date, to_date)
+        )
+    ]
+
+    for work_date in days:
+        found = {
+            "IN": index.checkin(work_date, "IN"),
+            "OUT": index.checkin(work_date, "OUT"),
+            "Timesheet": index.timesheet(work_date)
+        }
+        for doc_type, row in found.items():
+            if row:
+                set_doc_name(work_date, doc_type, row["name"])
+            else:
+                clear_doc_name(work_date, doc_type)
+
+    metrics.flush()
+    print(f"🔁 Reconciled ERP names for {len(days)} day(s)")
+
 
 # ==================================================
 if __name__ == "__main__":
-    run_erp_push()
+    import sys
+
+    if len(sys.argv) == 4 and sys.argv[1] == "--reconcile":
+        reconcile_doc_names(sys.argv[2], sys.argv[3])
+    else:
+        run_erp_push()
@@ -1,25 +1,155 @@
-import requests, os
-from config import ERP_BASE_URL
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def upload_file(session, file_path, doctype, docname):
-    url = f"{ERP_BASE_URL}/api/method/upload_file"
+from config import (
+    SCREENSHOT_DIR,
+    SCREENSHOT_UPLOAD_DOCTYPE,
+    SCREENSHOT_UPLOAD_WORKERS,
+    SCREENSHOT_UPLOAD_RATE_PER_SEC,
+    SCREENSHOT_UPLOAD_BATCH,
+    SCREENSHOT_UPLOAD_MAX_ATTEMPTS
+)
+from erp_client import ErpClient, TokenBucket, get_client, wrap_session
+from erp_metrics import erp_stage, metrics
+from step4_erp_push import get_employee
+from screenshot_store import record_status
+from local_db import (
+    get_pending_uploads,
+    record_upload,
+    record_upload_error,
+    get_upload_counts,
+    close_conn
+)
+
+def upload_file_url(session, file_path, doctype, docname):
+    """
+    session : ErpClient (preferred) or an authenticated requests.Session
+    Returns the ERP file_url; raises requests.HTTPError on failure.
+    """
+    client = session if isinstance(session, ErpClient) else wrap_session(session)
 
+    # Read once so a retried request can resend the same bytes
     with open(file_path, "rb") as f:
-        files = {
-            "file": (os.path.basename(file_path), f)
-        }
+        content = f.read()
+
+    files = {
+        "file": (os.path.basename(file_path), content)
+    }
+
+    data = {
+        "doctype": doctype,
+        "docname": docname,
+        "is_private": 1
+    }
+
+    r = client.request("POST", "/api/method/upload_file", files=files, data=data)
+    r.raise_for_status()
+
+    message = (r.json() or {}).get("message") or {}
+    return message.get("file_url")
+
+
+def upload_file(session, file_path, doctype, docname):
+    """
+    session : ErpClient (preferred) or an authenticated requests.Session
+    """
+    try:
+        upload_file_url(session, file_path, doctype, docname)
+    except Exception as e:
+        print("❌ Upload failed:", e)
+        return False
+
+    print("⬆️ Uploaded to ERP:", file_path)
+    return True
+
+
+# ==================================================
+# PERSISTENT UPLOAD QUEUE (screenshot_uploads)
+# ==================================================
+_upload_client = None
+_upload_client_lock = threading.Lock()
+
+
+def get_upload_client():
+    """
+    Separate pooled client with its own (small) token bucket, so uploads
+    never eat the check-in/timesheet request budget. Shares the main
+    circuit breaker: ERP offline → no upload attempts either.
+    """
+    global _upload_client
+    if _upload_client is None:
+        with _upload_client_lock:
+            if _upload_client is None:
+                _upload_client = ErpClient(
+                    pool_size=SCREENSHOT_UPLOAD_WORKERS,
+                    rate_limiter=TokenBucket(SCREENSHOT_UPLOAD_RATE_PER_SEC, SCREENSHOT_UPLOAD_WORKERS),
+                    breaker=get_client().breaker
+                )
+    return _upload_client
+
+
+def _upload_one(client, employee, rel_path):
+    full = os.path.join(SCREENSHOT_DIR, *rel_path.split("/"))
+
+    if not os.path.exists(full):
+        record_upload_error(rel_path, "file no longer on disk", SCREENSHOT_UPLOAD_MAX_ATTEMPTS, status="missing")
+        record_status(rel_path, "missing")
+        return False
+
+    try:
+        file_url = upload_file_url(client, full, SCREENSHOT_UPLOAD_DOCTYPE, employee)
+    except Exception as e:
+        record_upload_error(rel_path, e, SCREENSHOT_UPLOAD_MAX_ATTEMPTS)
+        print(f"⚠️ Screenshot upload failed ({rel_path}):", e)
+        return False
+
+    record_upload(rel_path, file_url)
+    record_status(rel_path, "uploaded", file_url=file_url)
+    return True
+
+
+def run_upload_queue(workers=SCREENSHOT_UPLOAD_WORKERS, batch=SCREENSHOT_UPLOAD_BATCH):
+    """
+    One bounded pass over the queue: upload up to `batch` pending
+    screenshots with `workers` in parallel. Rows are added when an
+    image is saved (ScreenshotQuota.register), so no directory walk.
+    Interrupted runs resume from the DB on the next call.
+    Returns per-pass stats.
+    """
+    started = time.perf_counter()
+    client = get_upload_client()
+
+    if not client.is_available():
+        return {"skipped": True, "uploaded": 0, "failed": 0, "seconds": 0.0}
+
+    pending = get_pending_uploads(batch)
+    if not pending:
+        return {"skipped": False, "uploaded": 0, "failed": 0, "seconds": 0.0}
 
-        data = {
-            "doctype": doctype,
-            "docname": docname,
-            "is_private": 1
-        }
+    employee = get_employee()
 
-        r = session.post(url, files=files, data=data)
+    def upload(rel_path):
+        try:
+            with erp_stage("upload"):
+                return _upload_one(client, employee, rel_path)
+        finally:
+            # Pool threads end with the pass → release their SQLite connection
+            close_conn()
 
-    if r.status_code in (200, 201):
-        print("⬆️ Uploaded to ERP:", file_path)
-        return True
+    try:
+        with ThreadPoolExecutor(max_workers=min(workers, len(pending)), thread_name_prefix="ErpUpload") as pool:
+            results = list(pool.map(upload, pending))
+    finally:
+        metrics.flush()
 
-    print("❌ Upload failed:", r.text)
-    return False
+    stats = {
+        "skipped": False,
+        "uploaded": sum(results),
+        "failed": len(results) - sum(results),
+        "seconds": round(time.perf_counter() - started, 3),
+        "backlog": get_upload_counts().get("pending", 0)
+    }
+    print("⬆️ Screenshot uploads:", stats)
+    return stats
@@ -1,9 +1,250 @@
+import io
 import os
+import queue
+import threading
+import time
 from datetime import datetime
+
 import pyautogui
-from config import SCREENSHOT_DIR
+from PIL import Image, features
+
+from config import (
+    SCREENSHOT_FORMAT,
+    SCREENSHOT_QUALITY,
+    SCREENSHOT_MAX_WIDTH,
+    SCREENSHOT_QUEUE_MAX,
+    SCREENSHOT_DEDUP,
+    SCREENSHOT_DEDUP_MAX_DISTANCE
+)
+
+from screenshot_quota import ScreenshotQuota
+from screenshot_store import image_path, rel_path, record_capture, migrate_flat_layout
+from local_db import close_conn, rename_upload
+
+EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg", "png": ".png"}
+
+
+# ==================================================
+# ENCODING
+# ==================================================
+def output_format(fmt=SCREENSHOT_FORMAT):
+    fmt = fmt.lower().replace("jpg", "jpeg")
+    if fmt == "webp" and not features.check("webp"):
+        return "jpeg"
+    return fmt if fmt in EXTENSIONS else "png"
+
+
+def downscale(img, max_width=SCREENSHOT_MAX_WIDTH):
+    if not max_width or img.width <= max_width:
+        return img
+    height = round(img.height * max_width / img.width)
+    # reducing_gap: fast integer pre-shrink, then a bilinear pass
+    return img.resize((max_width, height), Image.BILINEAR, reducing_gap=2.0)
+
+
+def encode(img, fmt, quality=SCREENSHOT_QUALITY):
+    buf = io.BytesIO()
+    if fmt == "png":
+        img.save(buf, "PNG", optimize=False)
+    elif fmt == "webp":
+        img.convert("RGB").save(buf, "WEBP", quality=quality, method=4)
+    else:
+        img.convert("RGB").save(buf, "JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def write_atomic(path, data):
+    """Readers (dashboard, uploader) never see a half-written image."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save_screenshot(img, taken_at=None, fmt=None):
+    """img is expected already downscaled (see downscale())."""
+    taken_at = taken_at or datetime.now()
+    fmt = output_format(fmt or SCREENSHOT_FORMAT)
+
+    data = encode(img, fmt)
+    path = image_path(taken_at, EXTENSIONS[fmt])
+    write_atomic(path, data)
+    return path, len(data)
+
+
+# ==================================================
+# PERCEPTUAL HASH (NEAR-DUPLICATE DETECTION)
+# ==================================================
+def perceptual_hash(img):
+    """
+    64-bit dHash: 9×8 grayscale thumbnail, one bit per
+    "left pixel brighter than right neighbour". Robust to
+    re-encoding / scaling, flips on real content changes.
+    """
+    px = list(img.resize((9, 8), Image.BOX).convert("L").getdata())
+    h = 0
+    for row in range(8):
+        for col in range(8):
+            h = (h << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return h
+
+
+def hash_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def take_screenshot(taken_at=None):
+    """Synchronous capture (scripts / debugging). The agent uses ScreenshotWorker."""
+    return save_screenshot(downscale(pyautogui.screenshot()), taken_at)[0]
+
+
+# ==================================================
+# CAPTURE WORKER (OFF THE ACCOUNTING LOOP)
+# ==================================================
+class ScreenshotWorker(threading.Thread):
+    """
+    Grabs, downscales, encodes and writes screenshots.
+
+    The agent loop only calls capture() (a non-blocking queue put);
+    a multi-monitor 4K grab + encode never delays minute accounting.
+
+    A capture whose perceptual hash is within
+    SCREENSHOT_DEDUP_MAX_DISTANCE of the last stored frame (same day)
+    is not written: its index entry references that frame instead.
+    """
+
+    def __init__(self, max_queue=SCREENSHOT_QUEUE_MAX, dedup=SCREENSHOT_DEDUP):
+        super().__init__(name="ScreenshotWorker", daemon=True)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopped = False
+
+        # Last STORED frame (not last capture): slow drift over many
+        # near-identical frames still ends up producing a new image
+        self.dedup = dedup
+        self._ref_hash = None
+        self._ref_file = None
+        self._ref_day = None
+
+        # Size index + quota / age eviction (runs on this thread)
+        self.quota = ScreenshotQuota()
+
+        self._stats_lock = threading.Lock()
+        self.captured = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.errors = 0
+        self.bytes_written = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+
+    # ------------------------------------------------
+    # PRODUCER API
+    # ------------------------------------------------
+    def capture(self, taken_at=None):
+        if self._stopped:
+            return False
+        try:
+            self._queue.put_nowait(taken_at or datetime.now())
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            print("⚠️ Screenshot queue full, capture dropped")
+            return False
+
+    def stop(self, timeout=30):
+        """Finish queued captures, then exit."""
+        if self._stopped:
+            return True
+        self._stopped = True
+        if not self.is_alive():
+            return True
+        self._queue.put(None)
+        self.join(timeout)
+        return not self.is_alive()
+
+    # ------------------------------------------------
+    # WORKER THREAD
+    # ------------------------------------------------
+    def run(self):
+        try:
+            migrate_flat_layout(rename_upload=rename_upload)
+            self.quota.reconcile()
+            self.quota.enforce()
+        except Exception as e:
+            print("⚠️ Screenshot quota check failed:", e)
+
+        while True:
+            taken_at = self._queue.get()
+            if taken_at is None:
+                close_conn()
+                return
+
+            started = time.perf_counter()
+            try:
+                filename, size = self._process(pyautogui.screenshot(), taken_at)
+            except Exception as e:
+                with self._stats_lock:
+                    self.errors += 1
+                print("❌ Screenshot failed:", e)
+                continue
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                self.captured += 1
+                self.duplicates += size is None
+                self.bytes_written += size or 0
+                self.last_ms = elapsed_ms
+                self.max_ms = max(self.max_ms, elapsed_ms)
+
+            if size is None:
+                print(f"📸 Screen unchanged – reference to {filename} ({elapsed_ms:.0f} ms)")
+            else:
+                print(f"📸 Screenshot saved: {filename} ({size // 1024} KB, {elapsed_ms:.0f} ms)")
+
+    def _process(self, img, taken_at):
+        """Returns (filename, bytes written) – bytes None for a duplicate."""
+        img = downscale(img)
+        phash = perceptual_hash(img)
+        day = taken_at.date()
+
+        if (
+            self.dedup
+            and self._ref_day == day
+            and hash_distance(phash, self._ref_hash) <= SCREENSHOT_DEDUP_MAX_DISTANCE
+        ):
+            record_capture(taken_at, self._ref_file, f"{phash:016x}", duplicate_of=self._ref_file)
+            return self._ref_file, None
+
+        path, size = save_screenshot(img, taken_at)
+        filename = os.path.basename(path)
+        record_capture(taken_at, filename, f"{phash:016x}", size, img.width, img.height)
+
+        # Index for upload + quota, then one incremental eviction step
+        try:
+            self.quota.register(rel_path(path), size, taken_at)
+            self.quota.enforce()
+        except Exception as e:
+            print("⚠️ Screenshot quota update failed:", e)
+
+        self._ref_hash, self._ref_file, self._ref_day = phash, filename, day
+        return filename, size
 
-def take_screenshot():
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(SCREENSHOT_DIR, f"{ts}.png")
-    pyautogui.screenshot(path)
+    # ------------------------------------------------
+    # COUNTERS
+    # ------------------------------------------------
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "captured": self.captured,
+                "duplicates": self.duplicates,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "bytes_written": self.bytes_written,
+                "avg_kb": round(self.bytes_written / self.captured / 1024, 1) if self.captured else 0.0,
+                "last_ms": round(self.last_ms, 1),
+                "max_ms": round(self.max_ms, 1)
+            }
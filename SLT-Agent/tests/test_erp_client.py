@@ -0,0 +1,128 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# Flat agent modules; config creates its folders under LOCALAPPDATA
+os.environ.setdefault("LOCALAPPDATA", tempfile.mkdtemp(prefix="slt-agent-test-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from erp_client import CircuitBreaker, CircuitOpenError, ErpClient, TokenBucket
+
+
+def _response(status):
+    r = requests.Response()
+    r.status_code = status
+    r._content = b"{}"
+    return r
+
+
+class HalfOpenProbeTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=1, cooldown=0, max_cooldown=0)
+        self.session = requests.Session()
+        self.client = ErpClient(
+            headers=None,
+            session=self.session,
+            base_url="http://erp.test",
+            max_retries=3,
+            breaker=self.breaker,
+            metrics=None
+        )
+
+        # One failure → open; cool-down 0 → half-open on the next check
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state(), CircuitBreaker.HALF_OPEN)
+
+    def test_unexpected_request_error_reopens_circuit(self):
+        with mock.patch.object(self.session, "request", side_effect=requests.exceptions.ChunkedEncodingError()):
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                self.client.request("GET", "/api/method/ping")
+
+        # Probe failed → open again (cool-down 0 → half-open, probe free)
+        self.assertEqual(self.breaker.state(), CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker._probe_in_flight)
+
+    def test_local_error_releases_probe(self):
+        with mock.patch.object(self.session, "request", side_effect=KeyError("bug")):
+            with self.assertRaises(KeyError):
+                self.client.request("GET", "/api/method/ping")
+
+        self.assertEqual(self.breaker.allow_request(), CircuitBreaker.HALF_OPEN)
+
+    def test_probe_is_sent_once(self):
+        with mock.patch.object(self.session, "request", return_value=_response(503)) as send:
+            r = self.client.request("GET", "/api/method/ping")
+
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(send.call_count, 1)
+
+    def test_successful_probe_closes_circuit(self):
+        with mock.patch.object(self.session, "request", return_value=_response(200)):
+            self.client.request("GET", "/api/method/ping")
+
+        self.assertEqual(self.breaker.state(), CircuitBreaker.CLOSED)
+
+    def test_second_request_fails_fast_while_probing(self):
+        self.assertEqual(self.breaker.allow_request(), CircuitBreaker.HALF_OPEN)
+
+        with mock.patch.object(self.session, "request") as send:
+            with self.assertRaises(CircuitOpenError):
+                self.client.request("GET", "/api/resource/Employee")
+        send.assert_not_called()
+
+
+class PostRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.session = requests.Session()
+        self.client = ErpClient(
+            headers=None,
+            session=self.session,
+            base_url="http://erp.test",
+            max_retries=2,
+            metrics=None
+        )
+        sleep = mock.patch("erp_client.time.sleep")
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def _post(self, error):
+        with mock.patch.object(self.session, "request", side_effect=[error, _response(200)]) as send:
+            try:
+                self.client.request("POST", "/api/resource/Employee Checkin", json={})
+            except requests.RequestException:
+                pass
+        return send.call_count
+
+    def test_connect_failure_is_retried(self):
+        refused = MaxRetryError(None, "/", reason=NewConnectionError(None, "refused"))
+        self.assertEqual(self._post(requests.ConnectionError(refused)), 2)
+        self.assertEqual(self._post(requests.ConnectTimeout()), 2)
+
+    def test_failure_after_send_is_not_retried(self):
+        aborted = ProtocolError("Connection aborted.", ConnectionResetError())
+        self.assertEqual(self._post(requests.ConnectionError(aborted)), 1)
+        self.assertEqual(self._post(requests.ReadTimeout()), 1)
+
+    def test_get_retries_any_connection_error(self):
+        aborted = ProtocolError("Connection aborted.", ConnectionResetError())
+        with mock.patch.object(self.session, "request", side_effect=[requests.ConnectionError(aborted), _response(200)]) as send:
+            self.client.request("GET", "/api/resource/Employee")
+        self.assertEqual(send.call_count, 2)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_capacity_below_one_token_is_rejected(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0.5, 0.5)
+
+    def test_fractional_rate_with_whole_capacity(self):
+        TokenBucket(0.5, 1).acquire()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# Flat agent modules; config creates its folders under LOCALAPPDATA
+os.environ.setdefault("LOCALAPPDATA", tempfile.mkdtemp(prefix="slt-agent-test-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tick_scheduler import Tick, TickScheduler
+
+
+class FakeClock:
+    """Stands in for the `time` module: monotonic + wall clock, sleep advances both."""
+
+    def __init__(self):
+        self.mono = 1000.0
+        self.wall = 1_700_000_000.0
+        self.on_sleep = None    # callback(delay) → run instead of a plain sleep
+
+    def monotonic(self):
+        return self.mono
+
+    def time(self):
+        return self.wall
+
+    def advance(self, seconds, wall=None):
+        self.mono += seconds
+        self.wall += seconds if wall is None else wall
+
+    def sleep(self, delay):
+        if self.on_sleep:
+            self.on_sleep(delay)
+        else:
+            self.advance(delay)
+
+
+class TickSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("tick_scheduler.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.scheduler = TickScheduler(tick_sec=10, suspend_gap_sec=30)
+        self.scheduler.start()
+
+    def test_normal_tick_credits_full_elapsed(self):
+        self.clock.advance(3)   # loop body
+
+        tick = self.scheduler.wait()
+
+        self.assertEqual(tick, Tick(10.0, 0.0, False))
+        self.assertEqual(self.scheduler.suspends, 0)
+        self.assertEqual(self.scheduler.skipped, 0)
+
+    def test_slow_body_is_awake_time(self):
+        # Long ERP push: no sleep at all, wall and monotonic move together
+        self.clock.advance(95)
+
+        tick = self.scheduler.wait()
+
+        self.assertEqual(tick, Tick(95.0, 0.0, False))
+        self.assertEqual(self.scheduler.skipped, 8)   # deadlines 1020 … 1090
+
+    def test_sleep_overshoot_is_suspend(self):
+        # Monotonic clock keeps running while asleep → sleep returns late
+        self.clock.on_sleep = lambda delay: self.clock.advance(delay + 600)
+        self.clock.advance(4)
+
+        tick = self.scheduler.wait()
+
+        self.assertTrue(tick.suspended)
+        self.assertEqual(tick.elapsed, 4.0)     # loop body only
+        self.assertEqual(tick.gap, 600.0)
+        self.assertEqual(self.scheduler.suspends, 1)
+
+    def test_clock_divergence_is_suspend(self):
+        # Monotonic clock stopped while asleep → only the wall clock jumped
+        self.clock.on_sleep = lambda delay: self.clock.advance(delay, wall=delay + 600)
+        self.clock.advance(4)
+
+        tick = self.scheduler.wait()
+
+        self.assertTrue(tick.suspended)
+        self.assertEqual(tick.elapsed, 10.0)    # monotonic time is awake time
+        self.assertEqual(tick.gap, 600.0)
+        self.assertEqual(self.scheduler.suspends, 1)
+
+    def test_small_jitter_is_not_suspend(self):
+        self.clock.on_sleep = lambda delay: self.clock.advance(delay + 5, wall=delay + 20)
+
+        tick = self.scheduler.wait()
+
+        self.assertFalse(tick.suspended)
+        self.assertEqual(tick.gap, 0.0)
+        self.assertEqual(tick.elapsed, 15.0)
+
+    def test_wall_clock_set_back_is_not_suspend(self):
+        self.clock.on_sleep = lambda delay: self.clock.advance(delay, wall=delay - 3600)
+
+        tick = self.scheduler.wait()
+
+        self.assertEqual(tick, Tick(10.0, 0.0, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import time
+from collections import namedtuple
+
+from config import AGENT_TICK_SEC, SUSPEND_GAP_SEC
+
+
+# elapsed   : awake seconds to credit for this tick (loop body included)
+# gap       : seconds the machine was asleep (0 if not suspended)
+# suspended : the machine slept / hibernated since the previous tick
+Tick = namedtuple("Tick", ["elapsed", "gap", "suspended"])
+
+
+# ==================================================
+# DRIFT-FREE AGENT TICKS
+# ==================================================
+class TickScheduler:
+    """
+    Wakes the agent loop on time.monotonic() deadlines (start + n * tick),
+    so slow iterations never push later ticks back, and reports how long
+    each tick really took instead of assuming `tick_sec`.
+
+    Suspend detection never looks at time spent in the loop body (a slow
+    ERP push at day close is awake time, credited in full):
+    - sleep overshoot: time.sleep(delay) returned more than
+      `suspend_gap_sec` late → the monotonic clock kept running while
+      asleep; only the loop body before the sleep is credited
+    - clock divergence: the wall clock moved `suspend_gap_sec` more than
+      the monotonic clock → the monotonic clock stopped while asleep, so
+      the monotonic elapsed time is awake time and is credited
+    Missed deadlines are skipped, not replayed in a burst.
+    """
+
+    def __init__(self, tick_sec=AGENT_TICK_SEC, suspend_gap_sec=SUSPEND_GAP_SEC):
+        self.tick_sec = tick_sec
+        self.suspend_gap_sec = suspend_gap_sec
+
+        self._deadline = None
+        self._last_mono = None
+        self._last_wall = None
+
+        self.ticks = 0
+        self.suspends = 0
+        self.skipped = 0    # deadlines missed (slow iteration / suspend)
+
+    # ------------------------------------------------
+    def start(self):
+        self._last_mono = time.monotonic()
+        self._last_wall = time.time()
+        self._deadline = self._last_mono + self.tick_sec
+
+    def wait(self):
+        """Sleep until the next deadline; returns the Tick that just ended."""
+        if self._deadline is None:
+            self.start()
+
+        before_sleep = time.monotonic()
+        delay = max(0.0, self._deadline - before_sleep)
+        if delay > 0:
+            time.sleep(delay)
+
+        now_mono = time.monotonic()
+        now_wall = time.time()
+
+        elapsed = now_mono - self._last_mono
+        busy = before_sleep - self._last_mono
+        overshoot = (now_mono - before_sleep) - delay
+        # < 0 when the wall clock is set back (NTP, manual) → no suspend
+        divergence = (now_wall - self._last_wall) - elapsed
+
+        self._last_mono = now_mono
+        self._last_wall = now_wall
+
+        # Next deadline on the original grid; behind by a whole tick or
+        # more → re-anchor instead of firing the missed ticks back to back
+        self._deadline += self.tick_sec
+        if now_mono >= self._deadline:
+            missed = int((now_mono - self._deadline) // self.tick_sec) + 1
+            self.skipped += missed
+            self._deadline += missed * self.tick_sec
+
+        self.ticks += 1
+        if overshoot > self.suspend_gap_sec:
+            self.suspends += 1
+            return Tick(busy, overshoot, True)
+        if divergence > self.suspend_gap_sec:
+            self.suspends += 1
+            return Tick(elapsed, divergence, True)
+        return Tick(elapsed, 0.0, False)
+
+    def stats(self):
+        return {
+            "tick_sec": self.tick_sec,
+            "ticks": self.ticks,
+            "suspends": self.suspends,
+            "skipped": self.skipped
+        }
@@ -1,13 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from datetime import datetime, timedelta
 import json
 import os
+import sys
+import mmap
+import zipfile
+import sqlite3
+import hashlib
+import threading
+from array import array
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import glob
 
+try:
+    import numpy as np  # optional: vectorised record stats
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image  # optional: screenshot thumbnails
+except ImportError:
+    Image = None
+
 app = FastAPI(title="Workforce Tracking API", version="1.0.0")
 
 # CORS middleware for React frontend
@@ -22,8 +39,10 @@ app.add_middleware(
 # Path configurations - UPDATE THESE TO YOUR ACTUAL PATHS
 STORAGE_PATH = Path("C:\\Users\\Mayank\\AppData\\Local\\SLT-Agent\\storage")  # Adjust to your agent storage path
 ACTIVITY_LOGS_PATH = Path("C:\\Users\\Mayank\\AppData\\Local\\SLT-Agent\\activity_logs")
-SCREENSHOTS_PATH = Path("C:\\Users\\Mayank\\AppData\\Local\\SLT-Agent\\storage\\screenshots")
+SCREENSHOTS_PATH = Path("C:\\Users\\Mayank\\AppData\\Local\\SLT-Agent\\screenshots")  # agent SCREENSHOT_DIR
 DEVICE_INFO_PATH = STORAGE_PATH / "device.json"
+LOCAL_DB_PATH = STORAGE_PATH / "local.db"
+THUMB_CACHE_PATH = Path(__file__).resolve().parent / "thumb_cache"  # generated, safe to delete
 
 # Helper functions
 def load_device_info() -> Dict[str, Any]:
@@ -41,14 +60,198 @@ def load_device_info() -> Dict[str, Any]:
             "device_id": "N/A"
         }
 
+def read_jsonl(log_file: Path) -> List[Dict[str, Any]]:
+    """Read a JSON-lines journal, skipping a truncated/garbled line"""
+    entries = []
+    with open(log_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+def read_archived(filename: str) -> Optional[bytes]:
+    """Read one day file from the agent's monthly archive (YYYY-MM.zip)"""
+    # Only the requested member is inflated, via the zip's central directory
+    archive = ACTIVITY_LOGS_PATH / f"{filename[:7]}.zip"
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            return zf.read(filename)
+    except (FileNotFoundError, KeyError, zipfile.BadZipFile):
+        return None
+
 def load_activity_log(date: str) -> List[Dict[str, Any]]:
     """Load activity log for a specific date"""
+    # Agent journal: one JSON object per line (YYYY-MM-DD.jsonl)
+    try:
+        return read_jsonl(ACTIVITY_LOGS_PATH / f"{date}.jsonl")
+    except FileNotFoundError:
+        pass
+
+    # Legacy format: single JSON array (YYYY-MM-DD.json)
     log_file = ACTIVITY_LOGS_PATH / f"{date}.json"
     try:
         with open(log_file, 'r') as f:
             return json.load(f)
     except FileNotFoundError:
+        pass
+
+    # Older days: compressed into the monthly archive by the agent
+    data = read_archived(f"{date}.jsonl")
+    if data is not None:
+        entries = []
+        for line in data.decode('utf-8').splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+    data = read_archived(f"{date}.json")
+    return json.loads(data) if data is not None else []
+
+# Binary activity records written by the agent (YYYY-MM-DD.bin)
+# Layout must match SLT-Agent/activity_records.py:
+#   epoch_sec | normal_sec | ot_sec | idle_sec | flags   (5 x uint32, little-endian)
+RECORD_FIELDS = 5
+RECORD_SIZE = RECORD_FIELDS * 4
+LUNCH_FLAG = 0x1
+BREAKS_SHIFT = 1
+
+def _record_columns(buf, count: int):
+    """Column views (epoch, normal, ot, idle, flags) over a record buffer"""
+    if np is not None:
+        table = np.frombuffer(buf, dtype='<u4', count=count * RECORD_FIELDS)
+        table = table.reshape(count, RECORD_FIELDS)
+        return [table[:, i] for i in range(RECORD_FIELDS)]
+
+    if sys.byteorder == 'little':
+        flat = memoryview(buf).cast('I')
+    else:
+        flat = array('I', bytes(buf))
+        flat.byteswap()
+    return [flat[i::RECORD_FIELDS] for i in range(RECORD_FIELDS)]
+
+def _stats_from_records(buf, count: int) -> Dict[str, Any]:
+    """Same stats as calculate_daily_stats, computed on raw record columns"""
+    epoch, normal, _ot, idle, flags = _record_columns(buf, count)
+
+    # A session restarts whenever normal seconds go backwards
+    if np is not None:
+        starts = np.concatenate(([0], np.flatnonzero(normal[1:] < normal[:-1]) + 1))
+        sessions = len(starts)
+        normal_total = int(np.maximum.reduceat(normal, starts).sum(dtype=np.int64))
+        idle_total = int(idle.sum(dtype=np.int64))
+        lunch_taken = bool((flags & LUNCH_FLAG).any())
+        max_breaks = int((flags >> BREAKS_SHIFT).max())
+    else:
+        sessions = 1
+        normal_total = 0
+        session_max = prev = normal[0]
+        for value in normal:
+            if value < prev:
+                normal_total += session_max
+                session_max = value
+                sessions += 1
+            elif value > session_max:
+                session_max = value
+            prev = value
+        normal_total += session_max
+        idle_total = sum(idle)
+        lunch_taken = any(f & LUNCH_FLAG for f in flags)
+        max_breaks = max(f >> BREAKS_SHIFT for f in flags)
+
+    first_timestamp = datetime.fromtimestamp(int(epoch[0]))
+    last_timestamp = datetime.fromtimestamp(int(epoch[-1]))
+    total_work_hours = normal_total / 3600
+
+    return {
+        "total_work_hours": round(total_work_hours, 2),
+        "total_active_minutes": round((normal_total - idle_total) / 60, 2),
+        "total_idle_minutes": round(idle_total / 60, 2),
+        "sessions": sessions,
+        "first_login": first_timestamp.strftime("%H:%M"),
+        "last_activity": last_timestamp.strftime("%H:%M"),
+        "breaks_taken": max_breaks,
+        "lunch_taken": lunch_taken
+    }
+
+def load_record_stats(date: str) -> Optional[Dict[str, Any]]:
+    """Daily stats from the mmap'd binary record file (None if absent)"""
+    record_file = ACTIVITY_LOGS_PATH / f"{date}.bin"
+    try:
+        f = open(record_file, 'rb')
+    except FileNotFoundError:
+        # Archived day: only this day's member is inflated
+        data = read_archived(f"{date}.bin")
+        count = len(data) // RECORD_SIZE if data else 0
+        return _stats_from_records(data[:count * RECORD_SIZE], count) if count else None
+
+    with f:
+        # Ignore a trailing partial record (agent crashed mid-write)
+        count = os.fstat(f.fileno()).st_size // RECORD_SIZE
+        if count == 0:
+            return None
+        with mmap.mmap(f.fileno(), count * RECORD_SIZE, access=mmap.ACCESS_READ) as mm:
+            return _stats_from_records(mm, count)
+
+def load_day_stats(date: str) -> Optional[Dict[str, Any]]:
+    """Daily stats, preferring binary records over the JSON journal"""
+    stats = load_record_stats(date)
+    if stats is not None:
+        return stats
+
+    activities = load_activity_log(date)
+    if not activities:
+        return None
+    return calculate_daily_stats(activities)
+
+def query_local_db(sql: str, params: Dict[str, Any]) -> List[tuple]:
+    """Read-only query against the agent's local.db (WAL: never blocks the agent)"""
+    if not LOCAL_DB_PATH.exists():
+        return []
+    conn = sqlite3.connect(f"{LOCAL_DB_PATH.as_uri()}?mode=ro", uri=True, timeout=5)
+    try:
+        return conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:
+        # Table missing (older agent version)
         return []
+    finally:
+        conn.close()
+
+def load_agent_settings() -> Dict[str, Any]:
+    """Settings the agent recorded in local.db (agent_settings, JSON values)"""
+    settings = {}
+    for key, value in query_local_db("SELECT key, value FROM agent_settings", {}):
+        try:
+            settings[key] = json.loads(value)
+        except (TypeError, ValueError):
+            continue
+    return settings
+
+INTERVAL_STATES = ("work", "idle", "break", "lunch", "uncounted", "suspended")
+
+def load_intervals(start_ts: str, end_ts: str) -> List[Dict[str, Any]]:
+    """Activity spans overlapping [start_ts, end_ts), clipped to the window"""
+    # Intervals never cross midnight → start_ts lower bound keeps the index scan short
+    rows = query_local_db("""
+        SELECT MAX(start_ts, :start), MIN(end_ts, :end), state
+        FROM activity_intervals
+        WHERE start_ts >= datetime(:start, '-1 day')
+          AND start_ts < :end
+          AND end_ts > :start
+        ORDER BY start_ts
+    """, {"start": start_ts, "end": end_ts})
+
+    spans = []
+    for start, end, state in rows:
+        seconds = (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+        spans.append({"start": start, "end": end, "state": state, "seconds": int(seconds)})
+    return spans
 
 def calculate_daily_stats(activities: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Calculate daily statistics from activity logs"""
@@ -143,9 +346,8 @@ def get_timesheet(days: int = 7):
     for i in range(days):
         date = end_date - timedelta(days=i)
         date_str = date.strftime("%Y-%m-%d")
-        activities = load_activity_log(date_str)
+        stats = load_day_stats(date_str) or calculate_daily_stats([])
         
-        stats = calculate_daily_stats(activities)
         timesheet.append({
             "date": date_str,
             "day": date.strftime("%A"),
@@ -176,6 +378,288 @@ def get_detailed_activity(date: str = None):
         "stats": calculate_daily_stats(activities)
     }
 
+INPUT_COUNT_FIELDS = ("keys", "clicks", "scrolls", "moves")
+
+@app.get("/activity/intensity")
+def get_activity_intensity(date: str = None):
+    """Per-tick input counts (keys / clicks / scrolls / mouse moves) for charting"""
+    if date is None:
+        date = datetime.now().strftime("%Y-%m-%d")
+
+    series = []
+    totals = dict.fromkeys(INPUT_COUNT_FIELDS, 0)
+
+    # Entries from agents before input counting have no counters → skipped
+    for entry in load_activity_log(date):
+        if "keys" not in entry:
+            continue
+        point = {"timestamp": entry.get("timestamp")}
+        for field in INPUT_COUNT_FIELDS:
+            point[field] = int(entry.get(field) or 0)
+            totals[field] += point[field]
+        series.append(point)
+
+    peak = max(series, key=lambda p: p["keys"] + p["clicks"] + p["scrolls"], default=None)
+
+    return {
+        "date": date,
+        "points": len(series),
+        "series": series,
+        "totals": totals,
+        "peak": peak
+    }
+
+def parse_time_of_day(value: str, name: str) -> str:
+    """'9:00' / '09:00:30' -> zero-padded 'HH:MM:SS' (matches the DB timestamps)"""
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%H:%M:%S")
+        except ValueError:
+            continue
+    raise HTTPException(status_code=400, detail=f"{name} must be HH:MM or HH:MM:SS")
+
+@app.get("/activity/intervals")
+def get_activity_intervals(date: str = None, start: str = "00:00", end: str = None, days: int = 1):
+    """Work / idle / break / lunch spans in a time-of-day window over N days ending at date"""
+    try:
+        end_date = datetime.strptime(date, "%Y-%m-%d") if date else datetime.now()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+
+    start_time = parse_time_of_day(start, "start")
+    # end is exclusive; omitted / 24:00 → up to midnight (next day 00:00:00)
+    end_time = None if end in (None, "24:00", "24:00:00") else parse_time_of_day(end, "end")
+    if end_time is not None and end_time <= start_time:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    result = []
+    for i in range(days):
+        day = end_date - timedelta(days=i)
+        date_str = day.strftime("%Y-%m-%d")
+        window_end = (
+            f"{date_str} {end_time}" if end_time
+            else (day + timedelta(days=1)).strftime("%Y-%m-%d 00:00:00")
+        )
+        spans = load_intervals(f"{date_str} {start_time}", window_end)
+        if not spans:
+            continue
+
+        totals = {state: 0 for state in INTERVAL_STATES}
+        for span in spans:
+            totals[span["state"]] = totals.get(span["state"], 0) + span["seconds"]
+
+        result.append({
+            "date": date_str,
+            "spans": spans,
+            "totals_seconds": totals
+        })
+
+    return {
+        "window": f"{start_time} - {end_time or '24:00:00'}",
+        "days": result
+    }
+
+@app.get("/apps/top")
+def get_top_apps(date: str = None, limit: int = 10, titles: int = 3):
+    """Most used applications of a day (credited work time per foreground app, local.db)"""
+    if date is None:
+        date = datetime.now().strftime("%Y-%m-%d")
+
+    # Credited work seconds per process (sums match daily_work)
+    rows = query_local_db("""
+        SELECT u.app_id, n.name, SUM(u.seconds), SUM(u.end_min - u.start_min + 1)
+        FROM app_usage u
+        JOIN app_names n ON n.id = u.app_id
+        WHERE u.day = :day
+        GROUP BY u.app_id
+        ORDER BY 3 DESC
+    """, {"day": date})
+
+    # Per-day title totals; "" = titles beyond the agent's per-app cap
+    title_rows = query_local_db("""
+        SELECT app_id, title, seconds
+        FROM app_titles
+        WHERE day = :day
+        ORDER BY seconds DESC
+    """, {"day": date})
+    app_titles: Dict[int, List[Dict[str, Any]]] = {}
+    for app_id, title, seconds in title_rows:
+        app_titles.setdefault(app_id, []).append({"title": title or "(other)", "seconds": seconds})
+
+    total_seconds = sum(r[2] for r in rows)
+    top = [
+        {
+            "process": name,
+            "seconds": seconds,
+            "minutes": minutes,
+            "share_pct": round(100 * seconds / total_seconds, 1) if total_seconds else 0.0,
+            "titles": app_titles.get(app_id, [])[:titles]
+        }
+        for app_id, name, seconds, minutes in rows[:limit]
+    ]
+
+    return {
+        "date": date,
+        "total_seconds": total_seconds,
+        "apps_used": len(rows),
+        "apps": top
+    }
+
+# Screenshot store layout must match SLT-Agent/screenshot_store.py:
+#   SCREENSHOTS_PATH/YYYY-MM-DD/YYYYMMDD_HHMMSS.webp
+#   SCREENSHOTS_PATH/YYYY-MM-DD/manifest.jsonl   (append-only, later status lines win)
+SCREENSHOT_EXTENSIONS = {".webp", ".jpg", ".jpeg", ".png"}
+SCREENSHOT_MANIFEST_FILE = "manifest.jsonl"
+
+def read_screenshot_manifest(manifest: Path) -> List[Dict[str, Any]]:
+    """Captures of a day in order, upload status folded in, evicted images left out"""
+    captures, statuses = [], {}
+    for entry in read_jsonl(manifest):
+        if "taken_at" in entry:
+            captures.append(entry)
+        elif "file" in entry:
+            statuses[entry["file"]] = entry.get("upload_status")
+
+    result = []
+    for entry in captures:
+        status = statuses.get(entry["file"], entry.get("upload_status"))
+        if status in ("evicted", "missing"):
+            continue
+        result.append(dict(entry, upload_status=status))
+    return result
+
+def screenshot_stamp(taken_at: Optional[str]) -> Optional[str]:
+    """'2024-01-05 10:20:00' -> '20240105_102000'"""
+    if not taken_at:
+        return None
+    return taken_at.replace("-", "").replace(":", "").replace(" ", "_")
+
+# Screenshot thumbnails: generated on first request (or prewarm),
+# cached on disk by source path + mtime, oldest evicted past the budget
+THUMB_SIZES = {"small": 160, "medium": 320, "large": 640}  # max width (px)
+THUMB_DEFAULT_SIZE = "medium"
+THUMB_QUALITY = 70
+THUMB_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_thumb_lock = threading.Lock()
+_thumb_cache_bytes: Optional[int] = None  # running total, scanned once
+
+def resolve_screenshot(date: str, filename: str) -> Path:
+    """Screenshot path for a date; 404 if missing or outside SCREENSHOTS_PATH"""
+    path = (SCREENSHOTS_PATH / date / filename).resolve()
+    root = SCREENSHOTS_PATH.resolve()
+    if root not in path.parents or not path.is_file():
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    return path
+
+def thumb_cache_file(source: Path, width: int) -> Path:
+    st = source.stat()
+    key = hashlib.sha1(f"{source}|{st.st_mtime_ns}|{st.st_size}".encode("utf-8")).hexdigest()
+    return THUMB_CACHE_PATH / key[:2] / f"{key}_{width}.jpg"
+
+def _evict_thumbnails(added: int) -> None:
+    """Keep the cache under THUMB_CACHE_MAX_BYTES, least recently used first"""
+    global _thumb_cache_bytes
+    with _thumb_lock:
+        if _thumb_cache_bytes is None:
+            _thumb_cache_bytes = sum(f.stat().st_size for f in THUMB_CACHE_PATH.rglob("*.jpg"))
+        else:
+            _thumb_cache_bytes += added
+
+        if _thumb_cache_bytes <= THUMB_CACHE_MAX_BYTES:
+            return
+
+        # Cache hits bump mtime (see get_thumbnail), so mtime ≈ last use
+        files = sorted(
+            ((f.stat().st_mtime, f.stat().st_size, f) for f in THUMB_CACHE_PATH.rglob("*.jpg")),
+            key=lambda item: item[0]
+        )
+        target = THUMB_CACHE_MAX_BYTES * 0.9
+        total = sum(size for _, size, _ in files)
+        for _, size, f in files:
+            if total <= target:
+                break
+            try:
+                f.unlink()
+                total -= size
+            except OSError:
+                continue
+        _thumb_cache_bytes = total
+
+def get_thumbnail(source: Path, width: int) -> Path:
+    """Cached thumbnail of a screenshot, generated on a miss"""
+    cached = thumb_cache_file(source, width)
+    if cached.exists():
+        try:
+            os.utime(cached)  # LRU: mark as recently used
+        except OSError:
+            pass
+        return cached
+
+    with Image.open(source) as img:
+        img.draft("RGB", (width, width))  # JPEG: decode at reduced scale
+        img = img.convert("RGB")
+        img.thumbnail((width, width * 4), Image.BILINEAR, reducing_gap=2.0)
+
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cached.with_name(f"{cached.name}.{threading.get_ident()}.tmp")
+        try:
+            img.save(tmp, "JPEG", quality=THUMB_QUALITY, optimize=True)
+            os.replace(tmp, cached)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    _evict_thumbnails(cached.stat().st_size)
+    return cached
+
+def prewarm_thumbnails(screenshot_dir: Path, sizes: List[int]) -> None:
+    for img_file in sorted(screenshot_dir.iterdir()):
+        if img_file.suffix.lower() not in SCREENSHOT_EXTENSIONS:
+            continue
+        for width in sizes:
+            try:
+                get_thumbnail(img_file, width)
+            except Exception:
+                # Unreadable / truncated / decompression bomb → skip the file only
+                break
+
+def thumb_url(date: str, filename: str, version: Any, size: str = THUMB_DEFAULT_SIZE) -> Optional[str]:
+    if Image is None:
+        return None
+    # v= changes when the image does (hash / size / mtime), so clients may cache aggressively
+    return f"/screenshots/{date}/{filename}/thumb?size={size}&v={version}"
+
+SCREENSHOT_STORED_STATUSES = ("pending", "uploaded", "failed")
+
+@app.get("/screenshots/usage")
+def get_screenshot_usage():
+    """Screenshot disk usage from the agent's size index (local.db), by upload status"""
+    rows = query_local_db("""
+        SELECT status, COUNT(*), COALESCE(SUM(size), 0), MIN(created_at)
+        FROM screenshot_uploads
+        GROUP BY status
+    """, {})
+
+    by_status = {status: {"files": files, "bytes": size} for status, files, size, _ in rows}
+    stored = [r for r in rows if r[0] in SCREENSHOT_STORED_STATUSES]
+    stored_bytes = sum(r[2] for r in stored)
+
+    # Effective limits as recorded by the agent (None: agent never recorded them)
+    settings = load_agent_settings()
+    quota_bytes = settings.get("screenshot_quota_bytes")
+
+    return {
+        "stored_bytes": stored_bytes,
+        "stored_files": sum(r[1] for r in stored),
+        "oldest": min((r[3] for r in stored if r[3]), default=None),
+        "quota_bytes": quota_bytes,
+        "used_pct": round(100 * stored_bytes / quota_bytes, 1) if quota_bytes else None,
+        "max_age_days": settings.get("screenshot_max_age_days"),
+        "by_status": by_status,
+        "thumb_cache_bytes": _thumb_cache_bytes
+    }
+
 @app.get("/screenshots/list")
 def list_screenshots(date: str = None):
     """List available screenshots for a date"""
@@ -188,23 +672,62 @@ def list_screenshots(date: str = None):
         return {
             "date": date,
             "screenshots": [],
-            "count": 0
+            "count": 0,
+            "unique_images": 0
         }
     
     screenshots = []
-    for img_file in screenshot_dir.glob("*.png"):
+
+    # Agent manifest: one small file per day, already in capture order.
+    # Unchanged screens reference the frame they duplicate.
+    manifest = screenshot_dir / SCREENSHOT_MANIFEST_FILE
+    if manifest.exists():
+        for entry in read_screenshot_manifest(manifest):
+            screenshots.append({
+                "filename": entry["file"],
+                # Same "YYYYMMDD_HHMMSS" form as the image filenames
+                "timestamp": screenshot_stamp(entry["taken_at"]),
+                "path": f"screenshots/{date}/{entry['file']}",
+                "thumb_url": thumb_url(date, entry["file"], entry.get("phash") or entry.get("size")),
+                "duplicate_of": entry.get("duplicate_of"),
+                "size": entry.get("size"),
+                "width": entry.get("width"),
+                "height": entry.get("height"),
+                "upload_status": entry.get("upload_status")
+            })
+
+        return {
+            "date": date,
+            "screenshots": screenshots,
+            "count": len(screenshots),
+            "unique_images": sum(1 for s in screenshots if not s["duplicate_of"])
+        }
+
+    # No manifest (older agent) → scan the folder
+    for img_file in screenshot_dir.iterdir():
+        # Skip .tmp partials and non-images
+        if img_file.suffix.lower() not in SCREENSHOT_EXTENSIONS:
+            continue
+        st = img_file.stat()
         screenshots.append({
             "filename": img_file.name,
             "timestamp": img_file.stem,  # Assuming filename is timestamp
-            "path": str(img_file.relative_to(STORAGE_PATH))
+            "path": f"screenshots/{date}/{img_file.name}",
+            "thumb_url": thumb_url(date, img_file.name, int(st.st_mtime)),
+            "duplicate_of": None,
+            "size": st.st_size,
+            "width": None,
+            "height": None,
+            "upload_status": None
         })
     
-    screenshots.sort(key=lambda x: x['filename'])
+    screenshots.sort(key=lambda x: (x['timestamp'], x['filename']))
     
     return {
         "date": date,
         "screenshots": screenshots,
-        "count": len(screenshots)
+        "count": len(screenshots),
+        "unique_images": sum(1 for s in screenshots if not s["duplicate_of"])
     }
 
 @app.get("/screenshots/{date}/{filename}")
@@ -217,6 +740,51 @@ def get_screenshot(date: str, filename: str):
     
     return FileResponse(screenshot_path)
 
+@app.get("/screenshots/{date}/{filename}/thumb")
+def get_screenshot_thumbnail(date: str, filename: str, size: str = THUMB_DEFAULT_SIZE):
+    """Serve a cached thumbnail (size: small | medium | large)"""
+    if size not in THUMB_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {list(THUMB_SIZES)}")
+
+    source = resolve_screenshot(date, filename)
+    if Image is None:
+        # Pillow not installed → full image, still correct
+        return FileResponse(source)
+
+    try:
+        thumb = get_thumbnail(source, THUMB_SIZES[size])
+    except Exception:
+        # OSError (truncated), DecompressionBombError, ValueError from Pillow
+        raise HTTPException(status_code=422, detail="Screenshot could not be decoded")
+
+    return FileResponse(
+        thumb,
+        media_type="image/jpeg",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
+@app.post("/screenshots/prewarm")
+def prewarm_screenshot_thumbnails(background_tasks: BackgroundTasks, date: str = None, sizes: str = THUMB_DEFAULT_SIZE):
+    """Generate thumbnails for a date in the background (sizes: comma-separated)"""
+    if date is None:
+        date = datetime.now().strftime("%Y-%m-%d")
+
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+
+    widths = [THUMB_SIZES[s] for s in sizes.split(",") if s in THUMB_SIZES]
+    screenshot_dir = (SCREENSHOTS_PATH / date).resolve()
+    if screenshot_dir.parent != SCREENSHOTS_PATH.resolve():
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+
+    if Image is None or not widths or not screenshot_dir.is_dir():
+        return {"date": date, "scheduled": False}
+
+    background_tasks.add_task(prewarm_thumbnails, screenshot_dir, widths)
+    return {"date": date, "scheduled": True, "sizes": widths}
+
 @app.get("/analytics/summary")
 def get_analytics_summary(days: int = 30):
     """Get analytics summary for the last N days"""
@@ -229,10 +797,9 @@ def get_analytics_summary(days: int = 30):
     for i in range(days):
         date = end_date - timedelta(days=i)
         date_str = date.strftime("%Y-%m-%d")
-        activities = load_activity_log(date_str)
+        stats = load_day_stats(date_str)
         
-        if activities:
-            stats = calculate_daily_stats(activities)
+        if stats:
             total_work_hours += stats['total_work_hours']
             total_active_minutes += stats['total_active_minutes']
             total_idle_minutes += stats['total_idle_minutes']
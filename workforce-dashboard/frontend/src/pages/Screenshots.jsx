@@ -95,7 +95,8 @@ const Screenshots = () => {
               >
                 <div className="aspect-video relative">
                   <img
-                    src={workforceAPI.getScreenshotUrl(selectedDate, screenshot.filename)}
+                    src={workforceAPI.getThumbnailUrl(selectedDate, screenshot)}
+                    loading="lazy"
                     alt={`Screenshot ${screenshot.timestamp}`}
                     className="w-full h-full object-cover"
                     onError={(e) => {
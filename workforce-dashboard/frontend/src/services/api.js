@@ -29,6 +29,9 @@ export const workforceAPI = {
     return api.get(url);
   },
   getScreenshotUrl: (date, filename) => `${API_BASE_URL}/screenshots/${date}/${filename}`,
+  getThumbnailUrl: (date, screenshot) => screenshot.thumb_url
+    ? `${API_BASE_URL}${screenshot.thumb_url}`
+    : `${API_BASE_URL}/screenshots/${date}/${screenshot.filename}`,
   
   // Analytics
   getAnalyticsSummary: (days = 30) => api.get(`/analytics/summary?days=${days}`),